@@ -0,0 +1,183 @@
+from django.db.models import prefetch_related_objects
+from django.urls import URLPattern
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+from .executor import gather, run
+from .paginator import count_queryset
+from .resolvers import get_subscriptions, prime_recipe_flags
+from .serializers import FollowSerializer
+
+# Заголовки, с которыми ответ может оказаться 304 без чтения страницы.
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+
+def _filtered_queryset(view):
+    return view.filter_queryset(view.get_queryset())
+
+
+def _serializer_data(serializer):
+    return serializer.data
+
+
+async def recipe_list(view, request, *args, **kwargs):
+    """Список рецептов, как ConditionalGetMixin.list.
+
+    Валидаторы, страница и флаги пользователя для её среза читаются
+    параллельно; число объектов считается заранее, чтобы валидаторы
+    и пагинатор взяли его из кеша, а не посчитали дважды.
+    """
+    queryset = await run(_filtered_queryset, view)
+    await run(count_queryset, queryset, request, view)
+    context = view.get_serializer_context()
+    calls = [(view.paginate_queryset, queryset)]
+    page_queryset = view.paginator.get_page_queryset(queryset, request)
+    if page_queryset is not None:
+        calls.append((prime_recipe_flags, context, page_queryset))
+    if any(header in request.META for header in CONDITIONAL_HEADERS):
+        etag, last_modified = await run(view.get_list_validators, queryset)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return view.set_validators(response, etag, last_modified)
+        page, *_ = await gather(*calls)
+    else:
+        (etag, last_modified), page, *_ = await gather(
+            (view.get_list_validators, queryset), *calls)
+    serializer = view.get_serializer(page, many=True, context=context)
+    response = view.get_paginated_response(
+        await run(_serializer_data, serializer))
+    return view.set_validators(response, etag, last_modified)
+
+
+async def recipe_detail(view, request, *args, **kwargs):
+    """Рецепт, как ConditionalGetMixin.retrieve: дата изменения, сам
+    рецепт и флаги пользователя читаются параллельно."""
+    context = view.get_serializer_context()
+    lookup = view.lookup_url_kwarg or view.lookup_field
+    calls = [
+        (view.get_object,),
+        (prime_recipe_flags, context,
+         view.get_queryset().filter(**{view.lookup_field: kwargs[lookup]})),
+    ]
+    if any(header in request.META for header in CONDITIONAL_HEADERS):
+        updated = await run(view.get_object_updated)
+        if updated is not None:
+            etag, last_modified = view.get_validators(request, updated)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return view.set_validators(response, etag, last_modified)
+        instance, _ = await gather(*calls)
+    else:
+        updated, instance, _ = await gather(
+            (view.get_object_updated,), *calls)
+    serializer = view.get_serializer(instance, context=context)
+    response = Response(await run(_serializer_data, serializer))
+    if updated is None:
+        return response
+    etag, last_modified = view.get_validators(request, updated)
+    return view.set_validators(response, etag, last_modified)
+
+
+async def subscriptions(view, request, *args, **kwargs):
+    """Подписки, как UserViewSet.subscriptions.
+
+    После страницы авторов параллельно читаются их рецепты и подписки
+    на них, затем флаги рецептов и общая часть рецептов из кеша.
+    Сериализатор получает всё готовым и в базу не ходит.
+    """
+    recipes_limit = view.get_recipes_limit()
+    page = await run(view.paginate_queryset,
+                     view.get_subscriptions_queryset())
+    serializer = FollowSerializer(page, context={'request': request},
+                                  many=True)
+    recipe_serializer = serializer.child.fields['recipes'].child
+    await gather(
+        (prefetch_related_objects, page,
+         view.get_recipes_prefetch(page, recipes_limit)),
+        (get_subscriptions(serializer.context).prime,
+         [author.id for author in page]),
+    )
+    recipes = [recipe for author in page for recipe in author.recipes.all()]
+    await gather(
+        (recipe_serializer.prime, recipes),
+        (recipe_serializer.load_shared, recipes),
+    )
+    return view.get_paginated_response(
+        await run(_serializer_data, serializer))
+
+
+# Маршруты роутера, которые обслуживаются асинхронно, и корутины
+# для их действий; действия без корутины целиком выполняются в пуле.
+ASYNC_ROUTES = {
+    'recipes-list': {'list': recipe_list},
+    'recipes-detail': {'retrieve': recipe_detail},
+    'users-subscriptions': {'subscriptions': subscriptions},
+    'tags-list': {},
+    'tags-detail': {},
+    'ingredients-list': {},
+    'ingredients-detail': {},
+}
+
+
+def async_view(sync_view, handlers):
+    """Асинхронная версия вьюхи, созданной ViewSet.as_view().
+
+    GET и HEAD проходят те же шаги, что APIView.dispatch, но каждый
+    синхронный шаг выполняется в пуле потоков, а действия из handlers —
+    корутинами с параллельными запросами. Остальные методы целиком
+    выполняет исходная вьюха в пуле.
+    """
+    actions = dict(sync_view.actions)
+    if 'get' in actions and 'head' not in actions:
+        actions['head'] = actions['get']
+
+    async def view(request, *args, **kwargs):
+        if request.method.lower() not in ('get', 'head'):
+            return await run(sync_view, request, *args, **kwargs)
+        self = sync_view.cls(**sync_view.initkwargs)
+        self.action_map = actions
+        for method, action in actions.items():
+            setattr(self, method, getattr(self, action))
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await run(self.initial, request, *args, **kwargs)
+            handler = handlers.get(self.action)
+            if handler is None:
+                response = await run(
+                    getattr(self, self.action), request, *args, **kwargs)
+            else:
+                response = await handler(self, request, *args, **kwargs)
+        except Exception as exc:
+            response = await run(self.handle_exception, exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs)
+        if hasattr(self.response, 'render'):
+            await run(self.response.render)
+        return self.response
+
+    view.cls = sync_view.cls
+    view.initkwargs = sync_view.initkwargs
+    view.actions = sync_view.actions
+    view.csrf_exempt = True
+    return view
+
+
+def async_urlpatterns(urlpatterns):
+    """Заменяет вьюхи маршрутов из ASYNC_ROUTES асинхронными.
+
+    Шаблоны адресов, имена и параметры вьюсетов остаются как у роутера.
+    """
+    return [
+        URLPattern(pattern.pattern,
+                   async_view(pattern.callback, ASYNC_ROUTES[pattern.name]),
+                   pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and pattern.name in ASYNC_ROUTES
+        else pattern
+        for pattern in urlpatterns
+    ]
@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import bump_version, get_version
+
+# Общая версия всех токенов и префикс версий токенов пользователя.
+TOKENS_VERSION: str = 'tokens'
+
+
+class TokenCache:
+    """LRU-кеш снимков токена и пользователя с ограниченным сроком жизни.
+
+    Хранятся не сами объекты, а значения их полей: каждый запрос
+    получает свои экземпляры, и потоки не делят изменяемые модели.
+    Снимки живут в памяти процесса, а версия токенов пользователя —
+    в общем кеше Django: выход, смена пароля или блокировка поднимают
+    её, и при следующем попадании снимок отбрасывается в любом
+    процессе. Общий кеш между процессами даёт MEMCACHED_LOCATION.
+
+    Версии поднимаются сразу и ещё раз после коммита: снимок,
+    прочитанный из базы до коммита, иначе сохранился бы под новой
+    версией. Для того же set() сверяет общую версию, прочитанную
+    до запроса к базе (generation()).
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+        # Версия читается вне блокировки: общий кеш может быть сетевым.
+        if entry is not None and entry[3] != self.get_version(entry[2]):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get_version(self, user_id):
+        return get_version(token_version_name(user_id))
+
+    def generation(self):
+        """Общая версия токенов, читается до запроса к базе."""
+        return get_version(TOKENS_VERSION)
+
+    def set(self, key, user_id, snapshot, generation):
+        if self.maxsize < 1:
+            return
+        version = self.get_version(user_id)
+        if self.generation() != generation:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (
+                time.monotonic() + self.ttl, snapshot, user_id, version)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        self._bump(user_id)
+        transaction.on_commit(lambda: self._bump(user_id))
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    @staticmethod
+    def _bump(user_id):
+        bump_version(token_version_name(user_id))
+        bump_version(TOKENS_VERSION)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry[2])
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_user[entry[2]]
+
+
+def token_version_name(user_id):
+    """Имя версии токенов пользователя в общем кеше."""
+    return f'{TOKENS_VERSION}:{user_id}'
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+def _snapshot(instance):
+    fields = instance._meta.concrete_fields
+    return (
+        instance._state.db,
+        tuple(field.attname for field in fields),
+        tuple(getattr(instance, field.attname) for field in fields),
+    )
+
+
+def _restore(model, snapshot):
+    return model.from_db(*snapshot)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, запоминающий токен и пользователя.
+
+    Проверка токена — самый частый запрос к базе: он выполняется для
+    каждого авторизованного запроса. Неверные токены и заблокированные
+    пользователи не кешируются, их по-прежнему проверяет база.
+    """
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        cached = token_cache.get(key)
+        if cached is not None:
+            token_snapshot, user_snapshot = cached
+            token = _restore(model, token_snapshot)
+            user = _restore(model.user.field.related_model, user_snapshot)
+            token.user = user
+            return (user, token)
+        generation = token_cache.generation()
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user.pk, (_snapshot(token), _snapshot(user)),
+                        generation)
+        return (user, token)
@@ -0,0 +1,90 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from .routers import read_primary
+
+VERSION_KEY_PREFIX: str = 'version'
+USER_STATE_PREFIX: str = 'user-state'
+RENDERED_CACHE_TIMEOUT: int = 60 * 60 * 24
+
+
+def _version_key(name):
+    return f'{VERSION_KEY_PREFIX}:{name}'
+
+
+def _new_version():
+    """Начальная версия из текущего времени.
+
+    Если ключ версии вытеснен из кеша, счёт начинается не с 1: иначе
+    под заново выданными версиями ожили бы старые записи, которые
+    кеш ещё не вытеснил.
+    """
+    return time.time_ns()
+
+
+def get_version(name):
+    """Текущая версия набора данных name для построения ключей кеша."""
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        cache.add(key, version, timeout=None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    """Инвалидирует всё, что закешировано под прежней версией name."""
+    key = _version_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _new_version()
+        cache.add(key, version, timeout=None)
+        return cache.get(key, version)
+
+
+def make_etag(content):
+    return f'"{hashlib.sha1(content).hexdigest()}"'
+
+
+def get_rendered_json(name, build):
+    """Отрендеренный JSON и его ETag для текущей версии набора name.
+
+    build() вызывается только при промахе, читает из основной базы
+    и должен вернуть данные, готовые для JSONRenderer.
+    """
+    key = f'rendered:{name}:{get_version(name)}'
+    rendered = cache.get(key)
+    if rendered is None:
+        with read_primary():
+            data = build()
+        content = JSONRenderer().render(data)
+        rendered = (content, make_etag(content))
+        cache.set(key, rendered, timeout=RENDERED_CACHE_TIMEOUT)
+    return rendered
+
+
+def get_many_or_build(keys, build):
+    """Значения по ключам keys одним обращением к кешу.
+
+    build(missing) вызывается один раз со списком промахов, читает
+    из основной базы и должен вернуть словарь {ключ: значение}; он
+    сохраняется одним set_many.
+    """
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        with read_primary():
+            built = build(missing)
+        cache.set_many(built, timeout=RENDERED_CACHE_TIMEOUT)
+        found.update(built)
+    return found
+
+
+def user_state_name(user_id):
+    """Имя версии избранного, покупок и подписок пользователя."""
+    return f'{USER_STATE_PREFIX}:{user_id}'
@@ -0,0 +1,32 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import BuyList, Liked, Recipe
+from users.models import Follow, User
+
+# (модель со счётчиком, поле счётчика, связанная модель, поле связи).
+COUNTERS = (
+    (Recipe, 'favorites_count', Liked, 'recipe'),
+    (Recipe, 'carts_count', BuyList, 'recipe'),
+    (User, 'followers_count', Follow, 'author'),
+    (User, 'recipes_count', Recipe, 'author'),
+)
+
+
+def actual_count(model, field):
+    """Подзапрос с настоящим числом связанных строк."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def recount(queryset, counter, related, field, **fields):
+    """Пересчитывает счётчик у объектов queryset одним UPDATE.
+
+    Нужен после пакетных операций: bulk_create(ignore_conflicts=True)
+    не сообщает, сколько строк реально вставлено, поэтому F() + n
+    мог бы разойтись с данными.
+    """
+    return queryset.update(
+        **{counter: actual_count(related, field)}, **fields)
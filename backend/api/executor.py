@@ -0,0 +1,56 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_WORKERS,
+    thread_name_prefix='api-db',
+)
+
+
+def check_persistent_connections():
+    """Требует CONN_MAX_AGE у всех баз для асинхронных вьюх.
+
+    Соединения потоков пула проверяются после каждой задачи, и при
+    CONN_MAX_AGE=0 каждый шаг вьюхи подключался бы к базе заново.
+    """
+    transient = [alias for alias, database in settings.DATABASES.items()
+                 if database.get('CONN_MAX_AGE', 0) == 0]
+    if transient:
+        raise ImproperlyConfigured(
+            'Для ASYNC_VIEWS нужен CONN_MAX_AGE больше нуля, базы: '
+            + ', '.join(transient))
+
+
+def _call(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Сигналы начала и конца запроса до потоков пула не доходят,
+        # соединения проверяем сами после каждой задачи.
+        for connection in connections.all():
+            connection.close_if_unusable_or_obsolete()
+
+
+async def run(func, *args, **kwargs):
+    """Выполняет синхронную функцию в ограниченном пуле потоков.
+
+    Пул общий для процесса и ограничен ASYNC_DB_WORKERS: у каждого его
+    потока своё соединение с базой. Контекстные переменные (реплика
+    запроса, профиль) передаются в поток.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        _executor,
+        functools.partial(context.run, _call, func, args, kwargs),
+    )
+
+
+async def gather(*calls):
+    """Выполняет вызовы (func, *args) параллельно, результаты по порядку."""
+    return await asyncio.gather(*(run(*call) for call in calls))
@@ -0,0 +1,79 @@
+from django.db.models import F
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+from .planner import limit_per_group, overflow_per_group
+
+FEED_MAX_ENTRIES: int = 500
+FEED_BATCH_SIZE: int = 1000
+
+
+def trim_feeds(user_ids):
+    """Удаляет из лент пользователей записи сверх FEED_MAX_ENTRIES."""
+    overflow_per_group(
+        FeedEntry.objects.filter(user_id__in=user_ids),
+        partition_by='user_id',
+        order_by=[F('pub_date').desc(), F('id').desc()],
+        limit=FEED_MAX_ENTRIES,
+    ).delete()
+
+
+def push_recipe(recipe):
+    """Раскладывает новый рецепт по лентам подписчиков автора пачками.
+
+    Ленты обрезаются один раз после раскладки: в каждую добавилось не
+    больше одной записи, так что лишнее есть только у заполненных лент.
+    """
+    followers = (
+        Follow.objects.filter(author_id=recipe.author_id)
+        .values_list('user_id', flat=True)
+    )
+    batch = []
+    for user_id in followers.order_by('user_id').iterator(
+            chunk_size=FEED_BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) == FEED_BATCH_SIZE:
+            _push_batch(recipe, batch)
+            batch = []
+    if batch:
+        _push_batch(recipe, batch)
+    trim_feeds(followers)
+
+
+def _push_batch(recipe, user_ids):
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, recipe_id=recipe.pk,
+                   pub_date=recipe.pub_date)
+         for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user, author_ids):
+    """Добавляет в ленту последние рецепты авторов новой подписки.
+
+    Рецепты всех авторов выбираются одним запросом с окном по автору.
+    """
+    recipes = list(
+        limit_per_group(
+            Recipe.objects.filter(author_id__in=author_ids),
+            partition_by='author_id',
+            order_by=[F('pub_date').desc(), F('id').desc()],
+            limit=FEED_MAX_ENTRIES,
+        ).values_list('pk', 'pub_date')
+    )
+    if not recipes:
+        return
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user=user, recipe_id=pk, pub_date=pub_date)
+         for pk, pub_date in recipes],
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim_feeds((user.pk,))
+
+
+def remove_authors(user, author_ids):
+    """Убирает из ленты рецепты авторов, от которых отписались."""
+    FeedEntry.objects.filter(
+        user=user, recipe__author_id__in=author_ids).delete()
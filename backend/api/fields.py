@@ -1,13 +1,55 @@
 import base64
+import binascii
+import re
+import uuid
+from tempfile import SpooledTemporaryFile
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
 from rest_framework import serializers
 
+# Кратно 4, чтобы каждый кусок base64 декодировался отдельно.
+DECODE_CHUNK_SIZE: int = 64 * 1024
+# До этого размера декодированный файл держится в памяти, дальше на диске.
+SPOOL_MAX_MEMORY: int = 1024 * 1024
+DATA_URI_PREFIX = re.compile(r'data:image/([\w.+-]+);base64,')
+# Переносы строк MIME base64 (RFC 2045) декодер с validate=True не примет.
+BASE64_WHITESPACE = re.compile(r'\s+')
+
 
 class Base64ImageField(serializers.ImageField):
+    """Картинка в виде data URI: data:image/<формат>;base64,<данные>.
+
+    Размер проверяется по длине строки до декодирования, а сама строка
+    декодируется кусками во временный файл, без второй копии в памяти.
+    """
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            prefix = DATA_URI_PREFIX.match(data)
+            if prefix is None:
+                raise serializers.ValidationError(
+                    'Изображение должно быть в формате '
+                    'data:image/<формат>;base64,<данные>.')
+            ext = prefix.group(1)
+            imgstr = BASE64_WHITESPACE.sub('', data[prefix.end():])
+            if len(imgstr) * 3 // 4 > settings.MAX_IMAGE_SIZE:
+                raise serializers.ValidationError(
+                    'Размер изображения не должен превышать '
+                    f'{settings.MAX_IMAGE_SIZE // (1024 * 1024)} МБ.')
+            data = File(self.decode(imgstr),
+                        name=f'{uuid.uuid4().hex}.{ext}')
         return super().to_internal_value(data)
+
+    def decode(self, imgstr):
+        file = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        try:
+            for start in range(0, len(imgstr), DECODE_CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    imgstr[start:start + DECODE_CHUNK_SIZE], validate=True))
+        except (binascii.Error, ValueError):
+            file.close()
+            raise serializers.ValidationError(
+                'Изображение должно быть закодировано в base64.')
+        file.seek(0)
+        return file
@@ -1,6 +1,11 @@
-from rest_framework.filters import SearchFilter
+from django import forms
+from django.core.validators import validate_slug
+from django.db.models import Exists, OuterRef
+from rest_framework.filters import OrderingFilter, SearchFilter
 from django_filters import rest_framework as filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe
+from recipes.search import (MATCH_ALL, MATCH_ANY, RELEVANCE_ANNOTATIONS,
+                            filter_by_ingredients, search_recipes)
 
 
 class IngredientFilter(SearchFilter):
@@ -12,22 +17,101 @@ class IngredientFilter(SearchFilter):
         fields = ('name',)
 
 
+class StableOrderingFilter(OrderingFilter):
+    """Сортировка, дополненная id для однозначного порядка.
+
+    Результаты текстового поиска и подбора по ингредиентам без явного
+    ?ordering= идут по релевантности.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if self.ordering_param not in request.query_params:
+            relevance = tuple(
+                f'-{name}' for name in RELEVANCE_ANNOTATIONS
+                if name in queryset.query.annotations
+            )
+            if relevance:
+                ordering = (*relevance, *(ordering or ()))
+        if ordering and not any(
+            field.lstrip('-') in ('id', 'pk') for field in ordering
+        ):
+            ordering = (*ordering, '-id')
+        return ordering
+
+
+class IdInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """Список id через запятую: ?ingredients=1,5,9."""
+    field_class = forms.IntegerField
+
+
+class SlugsField(forms.Field):
+    """Повторяющийся параметр: ?tags=breakfast&tags=lunch."""
+    widget = forms.SelectMultiple
+    default_validators = []
+
+    def to_python(self, value):
+        return [slug for slug in value or () if slug]
+
+    def validate(self, value):
+        for slug in value:
+            validate_slug(slug)
+
+
+class SlugsFilter(filters.Filter):
+    field_class = SlugsField
+
+
 class RecipeFilter(filters.FilterSet):
     """Фильтр рецептов."""
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name="tags__slug",
-        to_field_name="slug",
-    )
+    tags = SlugsFilter(method='get_tags')
     is_favorited = filters.NumberFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
+    # Подбор по ингредиентам применяется в filter_queryset целиком:
+    # ingredients зависит от match.
+    ingredients = IdInFilter(method='skip')
+    exclude = IdInFilter(method='skip')
+    match = filters.ChoiceFilter(
+        choices=((MATCH_ALL, MATCH_ALL), (MATCH_ANY, MATCH_ANY)),
+        method='skip',
+    )
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author',)
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        data = self.form.cleaned_data
+        if data.get('ingredients') or data.get('exclude'):
+            queryset = filter_by_ingredients(
+                queryset,
+                include=data.get('ingredients') or (),
+                exclude=data.get('exclude') or (),
+                match=data.get('match') or MATCH_ALL,
+            )
+        return queryset
+
+    def skip(self, queryset, name, value):
+        return queryset
+
+    def get_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов.
+
+        Полусоединение EXISTS вместо JOIN: рецепт с несколькими
+        подходящими тегами не дублируется, DISTINCT не нужен. Подзапрос
+        идёт по индексу (tag_id, recipe_id) таблицы связей.
+        """
+        if not value:
+            return queryset
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'), tag__slug__in=value)
+        ))
+
     def get_is_favorited(self, queryset, name, value):
         if value:
             return queryset.filter(is_liked__user=self.request.user)
@@ -37,3 +121,9 @@ class RecipeFilter(filters.FilterSet):
         if value:
             return queryset.filter(to_buy__user=self.request.user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        value = value.strip()
+        if value:
+            return search_recipes(queryset, value)
+        return queryset
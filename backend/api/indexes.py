@@ -0,0 +1,69 @@
+import threading
+from bisect import bisect_left
+
+from recipes.models import Ingredient
+
+from .cache import get_version
+from .routers import read_primary
+
+INGREDIENTS_SEARCH_LIMIT: int = 50
+
+
+class IngredientIndex:
+    """Индекс каталога ингредиентов в памяти процесса для автодополнения.
+
+    Хранит отсортированные названия и готовые к выдаче словари.
+    Строится при первом обращении и перестраивается, когда сигналы
+    модели Ingredient поднимают версию 'ingredients' в кеше.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._snapshot = ((), ())
+
+    def _load(self):
+        from .serializers import IngredientSerializer
+
+        version = get_version('ingredients')
+        if version == self._version:
+            return self._snapshot
+        with self._lock:
+            if version != self._version:
+                # Индекс запоминается под версией, которую реплика могла
+                # ещё не догнать.
+                with read_primary():
+                    data = IngredientSerializer(
+                        Ingredient.objects.all(), many=True).data
+                items = sorted(data,
+                               key=lambda item: item['name'].casefold())
+                keys = tuple(item['name'].casefold() for item in items)
+                self._snapshot = (keys, tuple(items))
+                self._version = version
+        return self._snapshot
+
+    def all(self):
+        return list(self._load()[1])
+
+    def search(self, query, limit=INGREDIENTS_SEARCH_LIMIT):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+        keys, items = self._load()
+        query = query.strip().casefold()
+        if not query:
+            return list(items[:limit])
+        found = []
+        position = bisect_left(keys, query)
+        while (position < len(keys) and len(found) < limit
+               and keys[position].startswith(query)):
+            found.append(items[position])
+            position += 1
+        if len(found) < limit:
+            for key, item in zip(keys, items):
+                if query in key and not key.startswith(query):
+                    found.append(item)
+                    if len(found) == limit:
+                        break
+        return found
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,198 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIClient
+from users.models import User
+
+DEFAULT_REPEAT: int = 50
+DEFAULT_WARMUP: int = 3
+# Допустимый рост p50 относительно базовой линии, в процентах.
+DEFAULT_TOLERANCE: int = 20
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'bench_baseline.json'
+
+# (сценарий, адрес, нужна ли авторизация). Адрес дополняется данными
+# из базы: id рецепта, слаги двух самых частых тегов и начало названия
+# ингредиента.
+SCENARIOS = (
+    ('recipe_list', '/api/recipes/?limit=6', False),
+    ('recipe_list_auth', '/api/recipes/?limit=6', True),
+    ('recipe_filter', '/api/recipes/?limit=6&{tags}', True),
+    ('recipe_detail', '/api/recipes/{recipe}/', True),
+    ('subscriptions', '/api/users/subscriptions/?limit=6&recipes_limit=3',
+     True),
+    ('download_shopping_cart', '/api/recipes/download_shopping_cart/', True),
+    ('ingredient_search', '/api/ingredients/?name={ingredient}', False),
+)
+
+
+def get_user(email=None):
+    """Пользователь для авторизованных запросов: по email или первый
+    с подписками и списком покупок."""
+    if email:
+        user = User.objects.filter(email=email).first()
+    else:
+        user = (User.objects.filter(follower__isnull=False,
+                                    buy_list__isnull=False).first()
+                or User.objects.first())
+    if user is None:
+        raise CommandError(
+            'Пользователь не найден, сначала выполните seed.')
+    return user
+
+
+def get_params():
+    """Данные из базы для адресов сценариев."""
+    recipe = Recipe.objects.only('id').first()
+    ingredient = Ingredient.objects.only('name').first()
+    if recipe is None or ingredient is None:
+        raise CommandError(
+            'В базе нет рецептов или ингредиентов, '
+            'сначала выполните seed.')
+    slugs = (Tag.objects.annotate(used=Count('recipes'))
+             .order_by('-used', 'pk').values_list('slug', flat=True)[:2])
+    return {
+        'recipe': recipe.id,
+        'tags': '&'.join(f'tags={slug}' for slug in slugs),
+        'ingredient': ingredient.name[:3],
+    }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, round(len(values) * fraction) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет основные эндпоинты через тестовый клиент: p50/p95, '
+            'SQL-запросы на запрос и пропускную способность. Результат '
+            'выводится в JSON и сравнивается с базовой линией.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+        parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+        parser.add_argument(
+            '--scenario', action='append',
+            choices=[name for name, _, _ in SCENARIOS],
+            help='Какие сценарии запускать; по умолчанию все.',
+        )
+        parser.add_argument(
+            '--user', help='Email пользователя для авторизованных запросов.')
+        parser.add_argument(
+            '--baseline', type=Path, default=DEFAULT_BASELINE,
+            help='Файл базовой линии для сравнения.',
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат как новую базовую линию.',
+        )
+        parser.add_argument(
+            '--tolerance', type=int, default=DEFAULT_TOLERANCE,
+            help='Допустимый рост p50, %%.',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['warmup'] < 0:
+            raise CommandError('Неверное число повторов или прогревов.')
+        user = get_user(options['user'])
+        params = get_params()
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        anonymous = APIClient(SERVER_NAME='localhost')
+
+        results = {}
+        for name, url, authenticated in SCENARIOS:
+            if options['scenario'] and name not in options['scenario']:
+                continue
+            results[name] = self.run_scenario(
+                client if authenticated else anonymous,
+                url.format(**params), options)
+
+        report = {
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'scenarios': results,
+        }
+        baseline = self.load_baseline(options['baseline'])
+        regressions = []
+        if baseline is not None:
+            report['comparison'] = self.compare(
+                results, baseline, options['tolerance'], regressions)
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+        if options['save_baseline']:
+            options['baseline'].write_text(
+                json.dumps(report, ensure_ascii=False, indent=2))
+            self.stderr.write(
+                f'Базовая линия сохранена в {options["baseline"]}')
+        elif regressions:
+            raise CommandError(
+                'Регрессия относительно базовой линии:\n'
+                + '\n'.join(regressions))
+
+    def run_scenario(self, client, url, options):
+        for _ in range(options['warmup']):
+            self.request(client, url)
+        # Запросы считаем отдельным прогоном: перехват SQL замедляет
+        # курсор и исказил бы время.
+        with CaptureQueriesContext(connection) as captured:
+            self.request(client, url)
+        # Журнал запросов сбрасывается в начале каждого следующего запроса.
+        queries = len(captured)
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            self.request(client, url)
+            timings.append(time.perf_counter() - started)
+        return {
+            'url': url,
+            'queries': queries,
+            'p50_ms': round(statistics.median(timings) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'rps': round(len(timings) / sum(timings), 1),
+        }
+
+    def request(self, client, url):
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: HTTP {response.status_code}')
+
+    def load_baseline(self, path):
+        if not path.exists():
+            self.stderr.write(
+                f'Базовой линии {path} нет, сравнение пропущено. '
+                'Сохранить текущий результат: --save-baseline.')
+            return None
+        return json.loads(path.read_text())
+
+    def compare(self, results, baseline, tolerance, regressions):
+        """Изменение p50 в процентах и числа запросов по сценариям."""
+        comparison = {}
+        for name, result in results.items():
+            previous = baseline['scenarios'].get(name)
+            if previous is None:
+                continue
+            change = (result['p50_ms'] / previous['p50_ms'] - 1) * 100
+            queries = result['queries'] - previous['queries']
+            comparison[name] = {
+                'p50_change_percent': round(change, 1),
+                'queries_change': queries,
+            }
+            if change > tolerance:
+                regressions.append(
+                    f'{name}: p50 {previous["p50_ms"]} -> '
+                    f'{result["p50_ms"]} мс ({change:+.1f}%)')
+            if queries > 0:
+                regressions.append(
+                    f'{name}: запросов {previous["queries"]} -> '
+                    f'{result["queries"]}')
+        return comparison
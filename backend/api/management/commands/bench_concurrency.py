@@ -0,0 +1,219 @@
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.authtoken.models import Token
+
+from .bench import get_params, get_user, percentile
+
+DEFAULT_CONCURRENCY = (1, 8, 32)
+DEFAULT_REQUESTS: int = 400
+DEFAULT_PORT: int = 8765
+# Время жизни соединений с базой в обоих серверах, асинхронные вьюхи
+# без него не запускаются.
+DEFAULT_CONN_MAX_AGE: int = 60
+STARTUP_TIMEOUT: int = 30
+REQUEST_TIMEOUT: int = 60
+MODES = ('sync', 'async')
+
+# (сценарий, адрес, нужна ли авторизация); адрес дополняется данными
+# из базы, как в bench.
+SCENARIOS = (
+    ('recipe_list', '/api/recipes/?limit=6', False),
+    ('recipe_list_auth', '/api/recipes/?limit=6', True),
+    ('recipe_detail', '/api/recipes/{recipe}/', True),
+    ('subscriptions', '/api/users/subscriptions/?limit=6&recipes_limit=3',
+     True),
+    ('tags', '/api/tags/', False),
+    ('ingredient_search', '/api/ingredients/?name={ingredient}', False),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает синхронные и асинхронные вьюхи под uvicorn: '
+            'проверяет, что ответы совпадают, и замеряет p50/p95 '
+            'и пропускную способность при нескольких уровнях '
+            'параллельности. Результат выводится в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+',
+            default=list(DEFAULT_CONCURRENCY),
+            help='Число одновременных клиентов, можно несколько.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=DEFAULT_REQUESTS,
+            help='Запросов на сценарий и уровень параллельности.',
+        )
+        parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+        parser.add_argument(
+            '--conn-max-age', type=int, default=DEFAULT_CONN_MAX_AGE,
+            help='CONN_MAX_AGE для обоих серверов.',
+        )
+        parser.add_argument(
+            '--scenario', action='append',
+            choices=[name for name, _, _ in SCENARIOS],
+            help='Какие сценарии запускать; по умолчанию все.',
+        )
+        parser.add_argument(
+            '--user', help='Email пользователя для авторизованных запросов.')
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec('uvicorn') is None:
+            raise CommandError('Для замера нужен uvicorn.')
+        if options['requests'] < 1 or min(options['concurrency']) < 1:
+            raise CommandError(
+                'Число запросов и клиентов должно быть положительным.')
+        if options['conn_max_age'] < 1:
+            raise CommandError(
+                'Для асинхронных вьюх нужен --conn-max-age больше нуля.')
+        user = get_user(options['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        params = get_params()
+        scenarios = [
+            (name, url.format(**params), authenticated)
+            for name, url, authenticated in SCENARIOS
+            if not options['scenario'] or name in options['scenario']
+        ]
+        self.headers = {'Authorization': f'Token {token.key}'}
+        self.base_url = f'http://127.0.0.1:{options["port"]}'
+
+        bodies, results = {}, {}
+        for mode in MODES:
+            with self.server(mode, options):
+                bodies[mode] = {
+                    name: self.fetch(url, authenticated)
+                    for name, url, authenticated in scenarios
+                }
+                for name, url, authenticated in scenarios:
+                    for concurrency in options['concurrency']:
+                        results.setdefault(name, {}).setdefault(
+                            str(concurrency), {})[mode] = self.load(
+                                url, authenticated, concurrency,
+                                options['requests'])
+        mismatched = [name for name, _, _ in scenarios
+                      if bodies['sync'][name] != bodies['async'][name]]
+        if mismatched:
+            raise CommandError(
+                'Ответы асинхронных вьюх расходятся с синхронными: '
+                + ', '.join(mismatched))
+
+        for name, url, _ in scenarios:
+            for levels in results[name].values():
+                levels['speedup'] = round(
+                    levels['async']['rps'] / levels['sync']['rps'], 2)
+        report = {
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'scenarios': {
+                name: {'url': url, 'concurrency': results[name]}
+                for name, url, _ in scenarios
+            },
+        }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+    def server(self, mode, options):
+        return UvicornServer(
+            options['port'],
+            {
+                'ASYNC_VIEWS': str(mode == 'async'),
+                'CONN_MAX_AGE': str(options['conn_max_age']),
+            },
+            self.base_url,
+        )
+
+    def fetch(self, url, authenticated):
+        response = requests.get(
+            self.base_url + url,
+            headers=self.headers if authenticated else None,
+            timeout=REQUEST_TIMEOUT,
+        )
+        if response.status_code != 200:
+            raise CommandError(f'{url}: HTTP {response.status_code}')
+        return response.content
+
+    def load(self, url, authenticated, concurrency, total):
+        """Задержки и пропускная способность при concurrency клиентах.
+
+        Каждый клиент держит своё keep-alive соединение; перед замером
+        каждый делает один запрос для прогрева.
+        """
+        headers = self.headers if authenticated else None
+        per_client = [total // concurrency + (number < total % concurrency)
+                      for number in range(concurrency)]
+        sessions = [requests.Session() for _ in per_client]
+
+        def get(session):
+            response = session.get(self.base_url + url, headers=headers,
+                                   timeout=REQUEST_TIMEOUT)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: HTTP {response.status_code}')
+
+        def client(session, count):
+            timings = []
+            for _ in range(count):
+                started = time.perf_counter()
+                get(session)
+                timings.append(time.perf_counter() - started)
+            return timings
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(get, sessions))
+            started = time.perf_counter()
+            timings = [timing for result in pool.map(client, sessions,
+                                                     per_client)
+                       for timing in result]
+            elapsed = time.perf_counter() - started
+        return {
+            'p50_ms': round(statistics.median(timings) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'rps': round(len(timings) / elapsed, 1),
+        }
+
+
+class UvicornServer:
+    """uvicorn с текущими настройками Django в отдельном процессе."""
+
+    def __init__(self, port, environment, base_url):
+        self.port = port
+        self.environment = environment
+        self.base_url = base_url
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'foodgram.asgi:application',
+             '--host', '127.0.0.1', '--port', str(self.port),
+             '--log-level', 'warning', '--no-access-log'],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                **self.environment,
+                'DJANGO_SETTINGS_MODULE': os.environ['DJANGO_SETTINGS_MODULE'],
+                'PYTHONPATH': os.pathsep.join(sys.path),
+            },
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError('uvicorn завершился при запуске.')
+            try:
+                requests.get(self.base_url + '/api/tags/', timeout=1)
+                return self
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError('uvicorn не запустился за отведённое время.')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
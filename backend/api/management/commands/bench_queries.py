@@ -0,0 +1,115 @@
+import statistics
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+from recipes.models import Recipe
+from recipes.search import search_recipes
+from users.models import User
+
+from api.management.commands.seed import USERNAME_PREFIX
+from api.paginator import RECIPES_PER_PAGE
+
+DEFAULT_RECIPES: int = 100_000
+DEFAULT_REPEAT: int = 20
+DEFAULT_SEED: int = 42
+SEARCH_QUERY: str = 'борщ'
+BENCH_TAGS: int = 12
+BENCH_FILTER_TAGS: int = 6
+
+
+def filter_tag_slugs():
+    return [f'{USERNAME_PREFIX}{number}'
+            for number in range(BENCH_FILTER_TAGS)]
+
+
+def search_scenario():
+    return search_recipes(Recipe.objects.all(), SEARCH_QUERY).order_by(
+        '-search_rank', '-pub_date', '-id')
+
+
+def search_icontains_scenario():
+    return Recipe.objects.filter(
+        Q(name__icontains=SEARCH_QUERY) | Q(text__icontains=SEARCH_QUERY)
+    ).order_by('-pub_date', '-id')
+
+
+def tags_scenario():
+    return Recipe.objects.filter(Exists(
+        Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag__slug__in=filter_tag_slugs())
+    )).order_by('-pub_date', '-id')
+
+
+def tags_join_scenario():
+    return (Recipe.objects.filter(tags__slug__in=filter_tag_slugs())
+            .distinct().order_by('-pub_date', '-id'))
+
+
+# Сценарий возвращает queryset; замеряется первая страница и COUNT(*).
+SCENARIOS = {
+    'search': search_scenario,
+    'search_icontains': search_icontains_scenario,
+    'tags': tags_scenario,
+    'tags_join': tags_join_scenario,
+}
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время типовых запросов к рецептам на синтетических '
+            'данных. С --generate создаёт их командой seed; '
+            'запускать только на отдельной базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=DEFAULT_RECIPES)
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+        parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+        parser.add_argument(
+            '--scenario', action='append', choices=tuple(SCENARIOS),
+            help='Какие сценарии запускать; по умолчанию все.',
+        )
+        parser.add_argument(
+            '--generate', action='store_true',
+            help='Сгенерировать данные командой seed, если их ещё нет. '
+                 'Без флага команда только читает базу.',
+        )
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Показать план запроса первой страницы.',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('Число повторов должно быть положительным.')
+        seeded = User.objects.filter(
+            username__startswith=USERNAME_PREFIX).exists()
+        if options['generate'] and not seeded:
+            call_command('seed', recipes=options['recipes'], tags=BENCH_TAGS,
+                         seed=options['seed'], stdout=self.stdout)
+        elif Recipe.objects.count() < options['recipes']:
+            raise CommandError(
+                f'В базе меньше {options["recipes"]} рецептов. Запустите '
+                'с --generate на отдельной базе без данных seed.')
+        self.stdout.write(
+            f'База: {connection.vendor}, рецептов: {Recipe.objects.count()}')
+        for name in options['scenario'] or SCENARIOS:
+            self.run_scenario(name, SCENARIOS[name], options)
+
+    def run_scenario(self, name, build, options):
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            queryset = build()
+            page = list(queryset[:RECIPES_PER_PAGE])
+            total = queryset.count()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[max(0, round(len(timings) * 0.95) - 1)]
+        self.stdout.write(
+            f'{name}: медиана {statistics.median(timings):.2f} мс, '
+            f'p95 {p95:.2f} мс, найдено {total}, на странице {len(page)}'
+        )
+        if options['explain']:
+            self.stdout.write(build()[:RECIPES_PER_PAGE].explain())
@@ -0,0 +1,126 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from recipes.models import Recipe
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.models import User
+
+from api.planner import get_query_plan
+from api.representations import load_recipe_relations, recipe_data
+from api.resolvers import get_favorites, get_shopping_cart, get_subscriptions
+from api.serializers import FollowSerializer, RecipeSerializer
+
+DEFAULT_OBJECTS: int = 1000
+DEFAULT_REPEAT: int = 5
+
+
+class Command(BaseCommand):
+    help = ('Сверяет быстрый путь сериализации рецептов и подписок '
+            'с сериализаторами DRF и сравнивает их скорость.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--objects', type=int, default=DEFAULT_OBJECTS)
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого ставятся флаги.',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['objects'] < 1:
+            raise CommandError(
+                'Число объектов и повторов должно быть положительным.')
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+        else:
+            user = (User.objects.filter(follower__isnull=False).first()
+                    or User.objects.first())
+        if user is None:
+            raise CommandError('Пользователь для проверки не найден.')
+        request = Request(
+            APIRequestFactory(SERVER_NAME='localhost').get('/api/recipes/'))
+        request.user = user
+        self.request = request
+        self.limit = options['objects']
+
+        if not self.load_recipes():
+            raise CommandError('В базе нет рецептов для проверки.')
+        failed = self.check_recipes() + self.check_subscriptions(user)
+        if failed:
+            raise CommandError(
+                'Быстрый путь расходится с DRF:\n' + '\n'.join(failed))
+        self.stdout.write(self.style.SUCCESS(
+            'Вывод быстрого пути совпадает с DRF.'))
+
+        drf = self.measure(self.render_drf, options['repeat'])
+        fast = self.measure(self.render_fast, options['repeat'])
+        self.stdout.write(
+            f'Рецептов: {len(self.load_recipes())}; '
+            f'DRF {drf:.0f} об/с, быстрый путь {fast:.0f} об/с, '
+            f'ускорение {fast / drf:.1f}x'
+        )
+
+    def load_recipes(self):
+        return list(get_query_plan(RecipeSerializer).apply(
+            Recipe.objects.all(), prefetch=False)[:self.limit])
+
+    def render_drf(self, recipes):
+        get_query_plan(RecipeSerializer).prefetch(recipes)
+        serializer = RecipeSerializer(context={'request': self.request})
+        serializer.prime(recipes)
+        return [serializer.render(recipe) for recipe in recipes]
+
+    def render_fast(self, recipes):
+        context = {'request': self.request}
+        RecipeSerializer(context=context).prime(recipes)
+        tags, ingredients = load_recipe_relations(
+            [recipe.pk for recipe in recipes])
+        return [
+            recipe_data(
+                recipe, tags[recipe.pk], ingredients[recipe.pk], self.request,
+                favorited=recipe.id in get_favorites(context),
+                in_cart=recipe.id in get_shopping_cart(context),
+                subscribed=recipe.author_id in get_subscriptions(context),
+            )
+            for recipe in recipes
+        ]
+
+    def measure(self, render, repeat):
+        """Медиана числа объектов в секунду, вместе с догрузкой связей."""
+        rates = []
+        for _ in range(repeat):
+            recipes = self.load_recipes()
+            started = time.perf_counter()
+            render(recipes)
+            rates.append(len(recipes) / (time.perf_counter() - started))
+        return statistics.median(rates)
+
+    def check_recipes(self):
+        expected = self.render_drf(self.load_recipes())
+        actual = self.render_fast(self.load_recipes())
+        return [
+            f'рецепт {drf["id"]}'
+            for drf, fast in zip(expected, actual)
+            if JSONRenderer().render(drf) != JSONRenderer().render(fast)
+        ]
+
+    def check_subscriptions(self, user):
+        authors = list(
+            get_query_plan(FollowSerializer).apply(
+                User.objects.filter(following__user=user), prefetch=False)
+            .prefetch_related(Prefetch(
+                'recipes', queryset=get_query_plan(RecipeSerializer).apply(
+                    Recipe.objects.all(), prefetch=False)))
+        )
+        serializer = FollowSerializer(context={'request': self.request})
+        serializer.prime(authors)
+        return [
+            f'подписка на {author.id}'
+            for author in authors
+            if JSONRenderer().render(serializer.render(author))
+            != JSONRenderer().render(serializer.to_representation(author))
+        ]
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from recipes.images import build_variants, variants_outdated
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Строит миниатюры и WebP для картинок рецептов, '
+            'у которых их ещё нет или они устарели.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.only(
+            'image', 'image_thumbnail', 'image_webp').order_by('pk')
+        built = 0
+        for recipe in recipes.iterator():
+            if variants_outdated(recipe):
+                build_variants(recipe.pk, recipe.image.name)
+                built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Варианты картинок обновлены у {built} рецептов.'))
@@ -1,17 +1,131 @@
+import csv
 import json
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from recipes.models import Ingredient
 
+from api.cache import bump_version
+
+DEFAULT_PATH: str = 'data/ingredients.json'
+DEFAULT_BATCH_SIZE: int = 1000
+READ_CHUNK_SIZE: int = 64 * 1024
+
+
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    """Построчно разбирает JSON-массив объектов, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if buffer.startswith('['):
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer:
+                raise CommandError('Ожидался JSON-массив ингредиентов.')
+        elif buffer.startswith(','):
+            buffer = buffer[1:]
+            continue
+        elif buffer.startswith(']'):
+            return
+        elif buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                buffer = buffer[end:]
+                continue
+        if eof:
+            raise CommandError('Файл JSON оборвался до конца массива.')
+        chunk = file.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+
+def iter_json_rows(file):
+    for row in iter_json_array(file):
+        yield row['name'], row['measurement_unit']
+
+
+def iter_csv_rows(file):
+    for row in csv.reader(file):
+        if not row or row == ['name', 'measurement_unit']:
+            continue
+        yield row[0], row[1]
+
+
+READERS = {
+    'json': iter_json_rows,
+    'csv': iter_csv_rows,
+}
+
 
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        with open('data/ingredients.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        for row in data:
-            account = Ingredient(
-                name=row['name'],
-                unit_of_measurement=row['measurement_unit']
-            )
-            account.save()
+    help = ('Загружает каталог ингредиентов из JSON или CSV. '
+            'Повторный запуск не создаёт дублей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=DEFAULT_PATH)
+        parser.add_argument(
+            '--format', choices=tuple(READERS),
+            help='Формат файла; по умолчанию берётся из расширения.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат файла: {file_format or path.name}.')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть положительным.')
+
+        started = time.monotonic()
+        before = Ingredient.objects.count()
+        processed = 0
+        with open(path, 'r', encoding='utf-8', newline='') as file, \
+                transaction.atomic():
+            rows = READERS[file_format](file)
+            while True:
+                batch = [
+                    Ingredient(name=name.strip(),
+                               unit_of_measurement=unit.strip())
+                    for name, unit in islice(rows, batch_size)
+                ]
+                if not batch:
+                    break
+                # Ключ уникальности (name, unit_of_measurement) покрывает
+                # все поля модели, так что пропуск конфликта равен upsert.
+                Ingredient.objects.bulk_create(
+                    batch, batch_size=batch_size, ignore_conflicts=True)
+                processed += len(batch)
+                elapsed = max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f'Обработано {processed} строк, '
+                    f'{processed / elapsed:.0f} строк/с'
+                )
+
+        # bulk_create не шлёт сигналы, индекс автодополнения
+        # инвалидируем явно.
+        bump_version('ingredients')
+        created = Ingredient.objects.count() - before
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {processed} строк за {elapsed:.2f} с, '
+            f'новых ингредиентов {created}, '
+            f'уже были в каталоге {processed - created}.'
+        ))
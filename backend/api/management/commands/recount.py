@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.counters import COUNTERS, actual_count
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики избранного, '
+            'покупок, подписчиков и рецептов.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model, counter, related, field in COUNTERS:
+                expression = actual_count(related, field)
+                fixed = (
+                    model.objects
+                    .exclude(**{counter: expression})
+                    # Счётчики выводятся в рецептах, дата меняет их ETag.
+                    .update(**{counter: expression},
+                            counters_updated_at=timezone.now())
+                )
+                self.stdout.write(
+                    f'{model._meta.label}.{counter}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,247 @@
+import heapq
+import random
+from collections import defaultdict
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.models import (BuyList, FeedEntry, Ingredient, IngredientSum,
+                            Liked, Recipe, Tag)
+from recipes.search import update_search_vector
+from users.models import Follow, User
+
+from api.cache import bump_version
+from api.feed import FEED_MAX_ENTRIES
+
+DEFAULT_USERS: int = 200
+DEFAULT_RECIPES: int = 2000
+DEFAULT_TAGS: int = 12
+DEFAULT_INGREDIENTS: int = 500
+DEFAULT_FOLLOWS: int = 10
+DEFAULT_FAVORITES: int = 20
+DEFAULT_CARTS: int = 5
+DEFAULT_SEED: int = 42
+BATCH_SIZE: int = 5000
+INGREDIENTS_PER_RECIPE: tuple = (3, 10)
+TAGS_PER_RECIPE: tuple = (1, 3)
+USERNAME_PREFIX: str = 'seed-'
+SEED_PASSWORD: str = 'seed-password'
+
+WORDS = (
+    'борщ', 'суп', 'щи', 'солянка', 'рассольник', 'окрошка', 'каша',
+    'гречка', 'рис', 'плов', 'пельмени', 'вареники', 'блины', 'оладьи',
+    'сырники', 'запеканка', 'котлеты', 'жаркое', 'гуляш', 'рагу', 'салат',
+    'винегрет', 'пирог', 'ватрушка', 'кулебяка', 'говядина', 'свинина',
+    'курица', 'индейка', 'рыба', 'лосось', 'картофель', 'капуста',
+    'свёкла', 'морковь', 'лук', 'чеснок', 'укроп', 'петрушка', 'сметана',
+    'творог', 'сыр', 'грибы', 'томаты', 'огурцы', 'перец', 'тушить',
+    'варить', 'жарить', 'запекать', 'нарезать', 'посолить', 'подавать',
+    'горячим', 'холодным', 'быстро', 'медленно', 'домашний', 'праздничный',
+)
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+
+
+def analyze(*models):
+    """Обновляет статистику планировщика после массовой вставки."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for model in models:
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетических пользователей, рецепты, теги, '
+            'ингредиенты, подписки, избранное и списки покупок. '
+            'При одном и том же --seed данные совпадают.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=DEFAULT_USERS)
+        parser.add_argument('--recipes', type=int, default=DEFAULT_RECIPES)
+        parser.add_argument('--tags', type=int, default=DEFAULT_TAGS)
+        parser.add_argument(
+            '--ingredients', type=int, default=DEFAULT_INGREDIENTS,
+            help='Сколько ингредиентов должно быть в каталоге; '
+                 'недостающие создаются.',
+        )
+        parser.add_argument(
+            '--follows', type=int, default=DEFAULT_FOLLOWS,
+            help='Подписок на пользователя.')
+        parser.add_argument(
+            '--favorites', type=int, default=DEFAULT_FAVORITES,
+            help='Рецептов в избранном у пользователя.')
+        parser.add_argument(
+            '--carts', type=int, default=DEFAULT_CARTS,
+            help='Рецептов в списке покупок у пользователя.')
+        parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['recipes'], options['tags'],
+               options['ingredients']) < 1:
+            raise CommandError(
+                'Пользователей, рецептов, тегов и ингредиентов должно '
+                'быть больше нуля.')
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError(
+                'Синтетические данные уже есть в базе, '
+                f'пользователи {USERNAME_PREFIX}*.')
+        self.rng = random.Random(options['seed'])
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            tags = self.create_tags(options['tags'])
+            ingredients = self.create_ingredients(options['ingredients'])
+            recipes = self.create_recipes(
+                options['recipes'], users, tags, ingredients)
+            self.create_relations(users, recipes, options)
+            self.fill_feeds(users)
+            update_search_vector(
+                Recipe.objects.filter(search_vector__isnull=True))
+            call_command('recount', stdout=self.stdout)
+        analyze(User, Tag, Ingredient, Recipe, Recipe.tags.through,
+                IngredientSum, Follow, Liked, BuyList, FeedEntry)
+        # bulk_create не шлёт сигналы, кеши инвалидируем явно.
+        for name in ('users', 'tags', 'ingredients', 'recipes'):
+            bump_version(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, рецептов {len(recipes)}. '
+            f'Пароль пользователей: {SEED_PASSWORD}.'))
+
+    def create_users(self, count):
+        password = make_password(SEED_PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'{USERNAME_PREFIX}{number}',
+                    email=f'{USERNAME_PREFIX}{number}@example.com',
+                    first_name=self.rng.choice(WORDS).capitalize(),
+                    last_name=self.rng.choice(WORDS).capitalize(),
+                    password=password,
+                )
+                for number in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return list(User.objects.filter(username__startswith=USERNAME_PREFIX)
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def create_tags(self, count):
+        Tag.objects.bulk_create(
+            [
+                Tag(name=f'Тег {USERNAME_PREFIX}{number}',
+                    color=f'#5e{number:04x}',
+                    slug=f'{USERNAME_PREFIX}{number}')
+                for number in range(count)
+            ],
+            ignore_conflicts=True,
+        )
+        return list(Tag.objects.filter(slug__startswith=USERNAME_PREFIX)
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def create_ingredients(self, count):
+        missing = count - Ingredient.objects.count()
+        if missing > 0:
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(
+                        name=f'{self.rng.choice(WORDS).capitalize()} '
+                             f'{number}',
+                        unit_of_measurement=self.rng.choice(UNITS),
+                    )
+                    for number in range(missing)
+                ],
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        return list(Ingredient.objects.order_by('pk')
+                    .values_list('pk', flat=True)[:count])
+
+    def create_recipes(self, count, users, tags, ingredients):
+        before = Recipe.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    author_id=self.rng.choice(users),
+                    name=' '.join(self.rng.sample(WORDS, 3)).capitalize(),
+                    text=' '.join(self.rng.choices(
+                        WORDS, k=self.rng.randint(20, 60))),
+                    cook_time=self.rng.randint(5, 180),
+                )
+                for _ in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        recipes = list(Recipe.objects.filter(pk__gt=before)
+                       .order_by('pk').values_list('pk', flat=True))
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipes
+                for tag_id in self.rng.sample(
+                    tags, min(len(tags),
+                              self.rng.randint(*TAGS_PER_RECIPE)))
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        IngredientSum.objects.bulk_create(
+            [
+                IngredientSum(recipe_id=recipe_id, ingredient_id=pk,
+                              sum=self.rng.randint(1, 500))
+                for recipe_id in recipes
+                for pk in self.rng.sample(
+                    ingredients, min(len(ingredients),
+                                     self.rng.randint(
+                                         *INGREDIENTS_PER_RECIPE)))
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        self.stdout.write(f'Создано рецептов: {len(recipes)}')
+        return recipes
+
+    def create_relations(self, users, recipes, options):
+        follows, favorites, carts = [], [], []
+        for user_id in users:
+            authors = [pk for pk in self.rng.sample(
+                users, min(len(users), options['follows'] + 1))
+                if pk != user_id][:options['follows']]
+            follows.extend(Follow(user_id=user_id, author_id=pk)
+                           for pk in authors)
+            favorites.extend(
+                Liked(user_id=user_id, recipe_id=pk)
+                for pk in self.rng.sample(
+                    recipes, min(len(recipes), options['favorites'])))
+            carts.extend(
+                BuyList(user_id=user_id, recipe_id=pk)
+                for pk in self.rng.sample(
+                    recipes, min(len(recipes), options['carts'])))
+        for model, objects in ((Follow, follows), (Liked, favorites),
+                               (BuyList, carts)):
+            model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+        self.stdout.write(
+            f'Подписок {len(follows)}, в избранном {len(favorites)}, '
+            f'в списках покупок {len(carts)}')
+
+    def fill_feeds(self, users):
+        """Ленты подписчиков, как их собрала бы раздача рецептов.
+
+        Рецепты и подписки читаются двумя запросами, ленты собираются
+        в памяти и вставляются большими пачками.
+        """
+        by_author = defaultdict(list)
+        for pk, author_id, pub_date in (
+                Recipe.objects.filter(author_id__in=users)
+                .values_list('pk', 'author_id', 'pub_date')):
+            by_author[author_id].append((pub_date, pk))
+        feeds = defaultdict(list)
+        for user_id, author_id in (Follow.objects.filter(user_id__in=users)
+                                   .values_list('user_id', 'author_id')):
+            feeds[user_id].extend(by_author[author_id])
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+                for user_id, recipes in feeds.items()
+                for pub_date, pk in heapq.nlargest(FEED_MAX_ENTRIES, recipes)
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,89 @@
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .cache import get_version, make_etag, user_state_name
+from .paginator import count_queryset
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы (ETag / Last-Modified) для list и retrieve.
+
+    Валидаторы считаются по датам изменения из conditional_fields без
+    сериализации: по их максимумам и числу объектов отфильтрованного
+    списка (то же число, что у пагинатора, обычно из кеша) и по датам
+    объекта. К ним подмешиваются версии данных из conditional_versions,
+    а для авторизованного пользователя — версия его избранного, покупок
+    и подписок.
+
+    Списки отдают только ETag: после удаления объекта или смены одной
+    из версий максимумы дат не растут, и Last-Modified по ним разрешил
+    бы клиенту устаревшую копию.
+    """
+    conditional_fields = ('updated_at',)
+    conditional_versions = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = self.get_list_validators(queryset)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        updated = self.get_object_updated()
+        if updated is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag, last_modified = self.get_validators(request, updated)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+
+    def get_list_validators(self, queryset):
+        latest = queryset.aggregate(**{
+            field: Max(field) for field in self.conditional_fields})
+        updated = tuple(latest[field] for field in self.conditional_fields)
+        count, _ = count_queryset(queryset, self.request, self)
+        etag, _ = self.get_validators(self.request, updated, count)
+        return etag, None
+
+    def get_object_updated(self):
+        """Даты изменения объекта по conditional_fields или None."""
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        return (
+            self.filter_queryset(self.get_queryset())
+            .filter(**{self.lookup_field: self.kwargs[lookup]})
+            .values_list(*self.conditional_fields)
+            .first()
+        )
+
+    def get_validators(self, request, updated, count=None):
+        parts = [request.get_full_path(), str(count)]
+        parts.extend(value.isoformat() if value else '' for value in updated)
+        parts.extend(
+            f'{name}:{get_version(name)}'
+            for name in self.conditional_versions
+        )
+        user = request.user
+        if user.is_authenticated:
+            state = user_state_name(user.pk)
+            parts.append(f'{state}:{get_version(state)}')
+            # Флаги пользователя не двигают updated_at, поэтому
+            # Last-Modified отдаём только анонимным клиентам.
+            last_modified = None
+        else:
+            updated = [value for value in updated if value]
+            last_modified = (int(max(updated).timestamp()) if updated
+                             else None)
+        return make_etag('|'.join(parts).encode()), last_modified
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
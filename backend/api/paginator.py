@@ -1,8 +1,208 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+
+from .cache import get_version, make_etag, user_state_name
+from .routers import read_primary
 
 RECIPES_PER_PAGE: int = 6
+COUNT_CACHE_TIMEOUT: int = 60
+COUNT_ESTIMATE_THRESHOLD: int = 100_000
+# Параметры, которые не меняют отфильтрованный набор.
+NON_FILTER_PARAMS = frozenset(('page', 'limit', 'cursor', 'pagination',
+                               'format', 'recipes_limit'))
+
+
+def estimate_count(queryset):
+    """Оценка числа строк таблицы по статистике планировщика PostgreSQL."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            (queryset.model._meta.db_table,),
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def get_count_key(request, view):
+    """Ключ кеша для числа объектов отфильтрованного списка.
+
+    Собирается из нормализованных параметров фильтрации и версий
+    count_versions вьюсета. Если список зависит от пользователя
+    (user_count_actions / user_count_params), в ключ попадает и версия
+    его избранного, покупок и подписок. Без count_versions счётчик не
+    кешируется.
+    """
+    versions = getattr(view, 'count_versions', None)
+    if versions is None:
+        return None
+    params = sorted(
+        (name, tuple(sorted(values)))
+        for name, values in request.query_params.lists()
+        if name not in NON_FILTER_PARAMS
+    )
+    parts = [type(view).__name__, str(view.action), repr(params)]
+    parts.extend(f'{name}:{get_version(name)}' for name in versions)
+    user = request.user
+    user_scoped = (
+        view.action in getattr(view, 'user_count_actions', ())
+        or any(name in request.query_params
+               for name in getattr(view, 'user_count_params', ()))
+    )
+    if user_scoped and user.is_authenticated:
+        state = user_state_name(user.pk)
+        parts.append(f'{state}:{get_version(state)}')
+    return 'count:' + make_etag('|'.join(parts).encode()).strip('"')
+
+
+def count_queryset(queryset, request, view):
+    """Число объектов списка и признак того, что оно точное.
+
+    Для больших таблиц без фильтров берётся оценка планировщика, для
+    остальных — COUNT(*). Результат кешируется на COUNT_CACHE_TIMEOUT
+    секунд.
+    """
+    key = get_count_key(request, view)
+    if key is None:
+        return _count(queryset)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    # Число кешируется под текущими версиями, реплика могла их
+    # ещё не догнать.
+    with read_primary():
+        result = _count(queryset)
+    cache.set(key, result, timeout=COUNT_CACHE_TIMEOUT)
+    return result
+
+
+def _count(queryset):
+    if not queryset.query.where:
+        estimate = estimate_count(queryset)
+        if estimate is not None and estimate >= COUNT_ESTIMATE_THRESHOLD:
+            return estimate, False
+    return queryset.count(), True
+
+
+class CountingPaginator(Paginator):
+    """Paginator, который берёт число объектов из count_queryset()."""
+
+    def __init__(self, object_list, per_page, request=None, view=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.request = request
+        self.view = view
+        self.count_exact = True
+
+    @cached_property
+    def count(self):
+        count, self.count_exact = count_queryset(
+            self.object_list, self.request, self.view)
+        return count
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = RECIPES_PER_PAGE
     page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = (
+            lambda object_list, per_page: CountingPaginator(
+                object_list, per_page, request=request, view=view)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_page_queryset(self, queryset, request):
+        """Срез queryset, который вернёт paginate_queryset, без COUNT(*).
+
+        None для номера страницы, который пагинатор не примет как число.
+        """
+        try:
+            number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            return None
+        if number < 1:
+            return None
+        page_size = self.get_page_size(request)
+        offset = (number - 1) * page_size
+        return queryset[offset:offset + page_size]
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_exact', self.page.paginator.count_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count_exact'] = {'type': 'boolean'}
+        return schema
+
+
+class LimitCursorPagination(CursorPagination):
+    """Курсорная пагинация без COUNT(*) и OFFSET по индексу сортировки."""
+    page_size = RECIPES_PER_PAGE
+    page_size_query_param = 'limit'
+    ordering = ('-id',)
+
+
+class LimitPagination(BasePagination):
+    """Постраничная пагинация, а по запросу — курсорная.
+
+    Курсорный режим включается параметром ?pagination=cursor или
+    наличием ?cursor=. Порядок для курсора берётся из фильтра сортировки
+    или атрибута ordering вьюсета; limit работает в обоих режимах.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.paginator = LimitPageNumberPagination()
+
+    def use_cursor(self, request):
+        return (self.cursor_query_param in request.query_params
+                or request.query_params.get(self.mode_query_param)
+                == 'cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.paginator = LimitCursorPagination()
+            self.paginator.ordering = getattr(
+                view, 'ordering', LimitCursorPagination.ordering)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_page_queryset(self, queryset, request):
+        """Срез страницы для постраничного режима, для курсора None."""
+        if self.use_cursor(request):
+            return None
+        return self.paginator.get_page_queryset(queryset, request)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def get_schema_fields(self, view):
+        return self.paginator.get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return self.paginator.get_schema_operation_parameters(view)
@@ -0,0 +1,176 @@
+from functools import lru_cache
+
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.db.models import F, Prefetch, Window, prefetch_related_objects
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from rest_framework import serializers
+
+
+class QueryPlan:
+    """План загрузки связанных объектов для сериализатора.
+
+    Строится по полям сериализатора: прямые внешние ключи подтягиваются
+    через select_related, обратные связи и many-to-many — через Prefetch
+    с собственным планом, а набор колонок ограничивается only().
+    Колонки, которые сериализатор читает мимо полей, перечисляются
+    в Meta.plan_fields.
+    """
+
+    def __init__(self, model, select_related=(), prefetch_related=(),
+                 only=None):
+        self.model = model
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+        self.only = None if only is None else tuple(only)
+
+    def apply(self, queryset, prefetch=True, fields=()):
+        """Применяет план; fields — колонки, нужные помимо сериализатора."""
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.only is not None:
+            queryset = queryset.only(*self.only, *fields)
+        if prefetch and self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+    def queryset(self):
+        queryset = self.model._default_manager.all()
+        if not queryset.ordered:
+            # Вложенные списки выводятся в стабильном порядке.
+            queryset = queryset.order_by('pk')
+        return self.apply(queryset)
+
+    def prefetch(self, instances):
+        """Догружает связи для уже полученных объектов."""
+        if self.prefetch_related:
+            prefetch_related_objects(list(instances), *self.prefetch_related)
+        return instances
+
+
+def _resolve_path(model, source):
+    """Проходит по source поля и возвращает цепочку полей модели.
+
+    Если source ссылается на свойство или метод, возвращает None:
+    такие поля нельзя спланировать и сужать набор колонок небезопасно.
+    """
+    chain = []
+    for attr in source.split('.'):
+        if model is None:
+            return None
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        chain.append(field)
+        model = field.related_model
+    return chain
+
+
+def _build_plan(serializer, model, remote_field=None):
+    select_related = set()
+    prefetch_related = []
+    meta = getattr(serializer, 'Meta', None)
+    only = {'pk', *getattr(meta, 'plan_fields', ())}
+    plannable = True
+    if remote_field is not None:
+        only.add(remote_field)
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        chain = _resolve_path(model, field.source)
+        if chain is None:
+            plannable = False
+            continue
+        path = '__'.join(item.name for item in chain)
+        last = chain[-1]
+        if last.many_to_many or last.one_to_many:
+            child = getattr(field, 'child', None)
+            child_plan = (
+                _build_plan(child, last.related_model,
+                            remote_field=_remote_name(last))
+                if isinstance(child, serializers.BaseSerializer)
+                else QueryPlan(last.related_model)
+            )
+            prefetch_related.append(
+                Prefetch(path, queryset=child_plan.queryset())
+            )
+            continue
+        nested = isinstance(field, serializers.BaseSerializer)
+        traversed = chain if nested else chain[:-1]
+        for index in range(len(traversed)):
+            prefix = '__'.join(part.name for part in traversed[:index + 1])
+            select_related.add(prefix)
+            only.add(prefix)
+        only.add(path)
+        if not nested:
+            continue
+        nested_plan = _build_plan(field, last.related_model)
+        select_related.update(
+            f'{path}__{name}' for name in nested_plan.select_related
+        )
+        prefetch_related.extend(
+            Prefetch(f'{path}__{lookup.prefetch_through}',
+                     queryset=lookup.queryset)
+            for lookup in nested_plan.prefetch_related
+        )
+        if nested_plan.only is None:
+            plannable = False
+        else:
+            only.update(f'{path}__{name}' for name in nested_plan.only
+                        if name != 'pk')
+
+    return QueryPlan(
+        model,
+        select_related=sorted(select_related),
+        prefetch_related=prefetch_related,
+        only=sorted(only) if plannable else None,
+    )
+
+
+def _remote_name(relation):
+    """Имя поля на связанной модели, по которому работает prefetch."""
+    if relation.one_to_many:
+        return relation.field.name
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_query_plan(serializer_class):
+    """Возвращает закешированный план для сериализатора модели."""
+    return _build_plan(serializer_class(), serializer_class.Meta.model)
+
+
+def _filter_by_rank(queryset, partition_by, order_by, condition, limit):
+    ranked = queryset.annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=F(partition_by),
+            order_by=order_by,
+        )
+    ).values('pk', 'row_number')
+    try:
+        sql, params = ranked.query.sql_with_params()
+    except EmptyResultSet:
+        return queryset.none()
+    pk_column = queryset.model._meta.pk.column
+    return queryset.model._default_manager.filter(pk__in=RawSQL(
+        f'SELECT ranked.{pk_column} FROM ({sql}) ranked '
+        f'WHERE ranked.row_number {condition} %s',
+        (*params, limit),
+    ))
+
+
+def limit_per_group(queryset, partition_by, order_by, limit):
+    """Оставляет в queryset первые limit строк каждой группы.
+
+    Строки нумеруются оконной функцией ROW_NUMBER() в разрезе
+    partition_by, отбор идёт в подзапросе на стороне базы.
+    """
+    return _filter_by_rank(queryset, partition_by, order_by, '<=', limit)
+
+
+def overflow_per_group(queryset, partition_by, order_by, limit):
+    """Строки queryset, которые не вошли в первые limit своей группы."""
+    return _filter_by_rank(queryset, partition_by, order_by, '>', limit)
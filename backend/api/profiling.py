@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+# Этапы запроса в порядке вывода в Server-Timing.
+PHASES = ('sql', 'serialize', 'render')
+
+_current = ContextVar('profile', default=None)
+_profiles = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+_profiles_lock = threading.Lock()
+
+
+class Profile:
+    """Время этапов и число SQL-запросов одного HTTP-запроса.
+
+    Этапы пересекаются: запросы, сделанные во время сериализации,
+    входят и в sql, и в serialize.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.depth = dict.fromkeys(PHASES, 0)
+        self.queries = 0
+
+    def execute(self, execute, sql, params, many, context):
+        self.queries += 1
+        with self.phase('sql'):
+            return execute(sql, params, many, context)
+
+    @contextmanager
+    def phase(self, name):
+        # Вложенные вызовы одного этапа считаются один раз.
+        self.depth[name] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.depth[name] -= 1
+            if not self.depth[name]:
+                self.durations[name] += time.perf_counter() - started
+
+    def server_timing(self, total):
+        entries = [
+            f'sql;dur={self.durations["sql"] * 1000:.2f};'
+            f'desc="{self.queries} queries"'
+        ]
+        entries.extend(
+            f'{name};dur={self.durations[name] * 1000:.2f}'
+            for name in PHASES[1:]
+        )
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def measure(phase):
+    """Засекает этап текущего запроса; без профилирования ничего не делает."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    with profile.phase(phase):
+        yield
+
+
+def get_profiles():
+    """Последние профили запросов, новые первыми."""
+    with _profiles_lock:
+        return list(reversed(_profiles))
+
+
+class ProfilingMiddleware:
+    """Профилирование запросов: число и время SQL, время сериализации
+    и рендеринга.
+
+    Включается настройкой PROFILING, иначе Django исключает middleware
+    из цепочки. Итоги отдаются заголовком Server-Timing, последние
+    PROFILING_BUFFER_SIZE профилей хранятся в памяти процесса.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = Profile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - profile.started
+        response['Server-Timing'] = profile.server_timing(total)
+        record = {
+            'time': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'queries': profile.queries,
+            'total_ms': round(total * 1000, 2),
+        }
+        record.update(
+            (f'{name}_ms', round(profile.durations[name] * 1000, 2))
+            for name in PHASES
+        )
+        with _profiles_lock:
+            _profiles.append(record)
+        return response
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся сразу после этого хука; рендерим сами,
+        # чтобы засечь время.
+        with measure('render'):
+            response.render()
+        return response
@@ -0,0 +1,72 @@
+import abc
+import csv
+import io
+import json
+
+from rest_framework import renderers
+
+
+class ShoppingListRenderer(renderers.BaseRenderer, metaclass=abc.ABCMeta):
+    """Базовый рендерер списка покупок.
+
+    Строки списка отдаются генератором render_stream(), чтобы ответ
+    можно было отправлять по частям через StreamingHttpResponse.
+    """
+    charset = 'utf-8'
+    filename = 'buy_list'
+
+    @abc.abstractmethod
+    def render_stream(self, rows):
+        """Части документа по строкам (название, единица, количество)."""
+
+    def stream(self, rows):
+        for chunk in self.render_stream(rows):
+            yield chunk.encode(self.charset)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # Так приходят ответы с ошибками, например 401.
+            return json.dumps(data, ensure_ascii=False).encode(self.charset)
+        return ''.join(self.render_stream(data)).encode(self.charset)
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def render_stream(self, rows):
+        yield 'Список покупок:\n\n'
+        for name, unit, amount in rows:
+            yield f'{name} - {amount} {unit}\n'
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render_stream(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def render_stream(self, rows):
+        yield '['
+        separator = ''
+        for name, unit, amount in rows:
+            yield separator + json.dumps(
+                {'name': name, 'measurement_unit': unit, 'amount': amount},
+                ensure_ascii=False,
+            )
+            separator = ','
+        yield ']'
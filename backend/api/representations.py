@@ -0,0 +1,99 @@
+from collections import defaultdict
+
+from recipes.models import IngredientSum, Recipe
+
+
+def file_url(file, request):
+    """Адрес файла так же, как его выводит serializers.ImageField."""
+    if not file:
+        return None
+    url = file.url
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def load_recipe_relations(recipe_ids):
+    """Теги и ингредиенты рецептов двумя запросами: ({pk: [...]}, ...).
+
+    Строки читаются через values_list, объекты моделей не создаются;
+    порядок тот же, что у Prefetch из плана RecipeSerializer.
+    """
+    tags = defaultdict(list)
+    rows = (Recipe.tags.through.objects
+            .filter(recipe_id__in=recipe_ids)
+            .order_by('tag_id')
+            .values_list('recipe_id', 'tag_id', 'tag__name', 'tag__color',
+                         'tag__slug'))
+    for recipe_id, pk, name, color, slug in rows:
+        tags[recipe_id].append(
+            {'id': pk, 'name': name, 'color': color, 'slug': slug})
+
+    ingredients = defaultdict(list)
+    rows = (IngredientSum.objects
+            .filter(recipe_id__in=recipe_ids)
+            .order_by('pk')
+            .values_list('recipe_id', 'ingredient_id', 'sum',
+                         'ingredient__name',
+                         'ingredient__unit_of_measurement'))
+    for recipe_id, pk, amount, name, unit in rows:
+        ingredients[recipe_id].append({
+            'id': pk,
+            'amount': amount,
+            'name': name,
+            'measurement_unit': unit,
+        })
+    return tags, ingredients
+
+
+def user_data(user, subscribed=False):
+    """Представление UserSerializer."""
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'is_subscribed': subscribed,
+        'followers_count': user.followers_count,
+        'recipes_count': user.recipes_count,
+    }
+
+
+def recipe_data(recipe, tags, ingredients, request, favorited=False,
+                in_cart=False, subscribed=False):
+    """Представление RecipeSerializer без обхода полей DRF.
+
+    Ключи и значения совпадают с сериализатором, это проверяет
+    команда bench_serializers.
+    """
+    return {
+        'id': recipe.id,
+        'tags': tags,
+        'author': user_data(recipe.author, subscribed),
+        'ingredients': ingredients,
+        'is_favorited': favorited,
+        'is_in_shopping_cart': in_cart,
+        'name': recipe.name,
+        'image': file_url(recipe.image, request),
+        'image_thumbnail': file_url(recipe.image_thumbnail, request),
+        'image_webp': file_url(recipe.image_webp, request),
+        'text': recipe.text,
+        'cooking_time': recipe.cook_time,
+        'favorites_count': recipe.favorites_count,
+        'carts_count': recipe.carts_count,
+    }
+
+
+def follow_data(user, recipes, subscribed=False):
+    """Представление FollowSerializer по готовому списку рецептов."""
+    return {
+        'email': user.email,
+        'id': user.id,
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'is_subscribed': subscribed,
+        'recipes': recipes,
+        'recipes_count': user.recipes_count,
+    }
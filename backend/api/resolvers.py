@@ -0,0 +1,123 @@
+from django.db.models import Exists, IntegerField, OuterRef, Value
+from recipes.models import BuyList, Liked, Recipe
+from users.models import Follow
+
+
+class RelationResolver:
+    """Пакетная проверка связей текущего пользователя с объектами.
+
+    Идентификаторы объектов страницы загружаются одним запросом через
+    prime(), дальше проверка `pk in resolver` идёт по памяти. Объекты,
+    которых не было в prime(), догружаются по требованию.
+    """
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.loaded = set()
+        self.related = set()
+
+    def prime(self, ids):
+        lookup = self.lookup(ids)
+        if lookup is not None:
+            self.related.update(lookup.values_list(self.field, flat=True))
+
+    def lookup(self, ids):
+        """Запрос связей для ещё не загруженных ids или None.
+
+        Идентификаторы сразу помечаются загруженными: выполнить
+        запрос должен вызывающий код.
+        """
+        missing = set(ids) - self.loaded
+        if not missing:
+            return None
+        self.loaded |= missing
+        if self.queryset is None:
+            return None
+        return self.queryset.filter(
+            **{f'{self.field}__in': missing}).order_by()
+
+    def __contains__(self, pk):
+        self.prime((pk,))
+        return pk in self.related
+
+
+def prime_together(*pairs):
+    """Заполняет несколько резолверов одним запросом UNION ALL.
+
+    pairs — пары (резолвер, идентификаторы объектов).
+    """
+    queries = []
+    for index, (resolver, ids) in enumerate(pairs):
+        lookup = resolver.lookup(ids)
+        if lookup is not None:
+            queries.append(lookup.annotate(
+                resolver=Value(index, output_field=IntegerField()),
+            ).values_list('resolver', resolver.field))
+    if not queries:
+        return
+    for index, pk in queries[0].union(*queries[1:], all=True):
+        pairs[index][0].related.add(pk)
+
+
+def prime_recipe_flags(context, recipes):
+    """Флаги пользователя запроса для рецептов из queryset recipes.
+
+    Нужны не id, а сам queryset (например, срез страницы), поэтому
+    запрос можно выполнять параллельно с выборкой рецептов. Загруженными
+    отмечаются только рецепты и авторы, попавшие в выборку: если между
+    запросами страница изменилась, недостающее догрузится как обычно.
+    """
+    user = context['request'].user
+    if not user.is_authenticated:
+        return
+    rows = (
+        Recipe.objects.filter(pk__in=recipes.values('pk'))
+        .annotate(
+            favorited=Exists(Liked.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            in_cart=Exists(BuyList.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author_id'))),
+        )
+        .order_by()
+        .values_list('pk', 'author_id', 'favorited', 'in_cart',
+                     'subscribed')
+    )
+    favorites = get_favorites(context)
+    shopping_cart = get_shopping_cart(context)
+    subscriptions = get_subscriptions(context)
+    for pk, author_id, favorited, in_cart, subscribed in rows:
+        for resolver, key, related in ((favorites, pk, favorited),
+                                       (shopping_cart, pk, in_cart),
+                                       (subscriptions, author_id,
+                                        subscribed)):
+            resolver.loaded.add(key)
+            if related:
+                resolver.related.add(key)
+
+
+def _get_resolver(context, key, model, field):
+    resolver = context.get(key)
+    if resolver is None:
+        user = context['request'].user
+        queryset = (model.objects.filter(user=user)
+                    if user.is_authenticated else None)
+        resolver = context[key] = RelationResolver(queryset, field)
+    return resolver
+
+
+def get_subscriptions(context):
+    """Авторы, на которых подписан пользователь запроса."""
+    return _get_resolver(context, 'subscriptions', Follow, 'author_id')
+
+
+def get_favorites(context):
+    """Рецепты в избранном у пользователя запроса."""
+    return _get_resolver(context, 'favorites', Liked, 'recipe_id')
+
+
+def get_shopping_cart(context):
+    """Рецепты в списке покупок пользователя запроса."""
+    return _get_resolver(context, 'shopping_cart', BuyList, 'recipe_id')
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.authtoken.models import Token
+
+from .executor import run
+
+PRIMARY_DATABASE: str = 'default'
+PIN_KEY_PREFIX: str = 'replica-pin'
+READ_PATH_PREFIX: str = '/api/'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Реплика, выбранная ReplicaMiddleware для текущего запроса.
+_replica = ContextVar('replica', default=None)
+
+
+def _pin_key(name):
+    return f'{PIN_KEY_PREFIX}:{name}'
+
+
+def _client_name(request):
+    """Клиент определяется по заголовку Authorization: токен проверяет
+    DRF уже внутри вьюхи, а решение о базе нужно раньше."""
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return hashlib.sha1(authorization.encode()).hexdigest()
+
+
+def pin_primary(client):
+    """Отправляет чтения клиента в основную базу на
+    REPLICA_STICKY_SECONDS, пока реплики догоняют его запись."""
+    if settings.REPLICA_DATABASES:
+        cache.set(_pin_key(client), True,
+                  timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+@contextmanager
+def read_primary():
+    """Чтения внутри блока идут в основную базу и в запросе, который
+    обслуживает реплика.
+
+    Так заполняется общий кеш: записи в нём живут под текущими версиями
+    данных, а реплика может их ещё не догнать.
+    """
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """Чтения из реплик внутри ReplicaMiddleware, остальное — в основную
+    базу.
+
+    Реплика выбирается один раз на запрос: реплики отстают по-разному,
+    и запросы одной страницы должны видеть одно состояние данных.
+    Токены читаются из основной базы всегда: только что выданный при
+    входе токен мог ещё не дойти до реплики.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is not None and model is not Token:
+            return replica
+        return PRIMARY_DATABASE
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, объекты из них совместимы.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == PRIMARY_DATABASE
+
+
+class ReplicaMiddleware:
+    """Отправляет безопасные запросы к API в реплики.
+
+    После изменяющего запроса клиент на REPLICA_STICKY_SECONDS
+    закрепляется за основной базой и видит свои изменения; остальные
+    клиенты продолжают читать реплики. Общий кеш заполняется из
+    основной базы (read_primary), поэтому отстающая реплика не попадёт
+    в него под новой версией. Закрепления хранятся в кеше Django,
+    общем для процессов при MEMCACHED_LOCATION. Без REPLICA_DATABASES
+    middleware отключается.
+
+    Под ASGI работает асинхронно, чтобы не переводить асинхронные
+    вьюхи в синхронный режим.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django отличает асинхронные middleware, как
+            # в MiddlewareMixin.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        client = _client_name(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if client is not None:
+                pin_primary(client)
+            return response
+        if not self.use_replica(request, client):
+            return self.get_response(request)
+        token = _replica.set(random.choice(settings.REPLICA_DATABASES))
+        try:
+            return self.get_response(request)
+        finally:
+            _replica.reset(token)
+
+    async def __acall__(self, request):
+        client = _client_name(request)
+        if request.method not in SAFE_METHODS:
+            response = await self.get_response(request)
+            if client is not None:
+                await run(pin_primary, client)
+            return response
+        if not await run(self.use_replica, request, client):
+            return await self.get_response(request)
+        token = _replica.set(random.choice(settings.REPLICA_DATABASES))
+        try:
+            return await self.get_response(request)
+        finally:
+            _replica.reset(token)
+
+    def use_replica(self, request, client):
+        if not request.path.startswith(READ_PATH_PREFIX):
+            return False
+        return client is None or not cache.get(_pin_key(client))
@@ -1,17 +1,33 @@
+import hashlib
 import re
 
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
+from django.db.models import Manager
 from django.shortcuts import get_object_or_404
 from djoser.serializers import (
     UserCreateSerializer as DjoserUserCreateSerializer)
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from recipes.models import (BuyList, Ingredient, IngredientSum,
                             Liked, Recipe, Tag)
+from recipes.signals import touch_recipes
 from users.models import User, Follow
 
+from .cache import get_many_or_build, get_version
+from .feed import push_recipe
 from .fields import Base64ImageField
+from .profiling import measure
+from .representations import follow_data, load_recipe_relations, recipe_data
+from .resolvers import (get_favorites, get_shopping_cart, get_subscriptions,
+                        prime_together)
 from rest_framework import serializers
 
+BULK_MAX_IDS: int = 100
+# Версии данных, от которых зависит общая для всех зрителей часть
+# рецепта; изменения самого рецепта и его автора отслеживаются
+# по их updated_at. Счётчики в ключ не входят, их накладывает with_flags.
+SHARED_RECIPE_VERSIONS = ('tags', 'ingredients')
+
 
 class UserCreateSerializer(DjoserUserCreateSerializer):
     class Meta:
@@ -29,21 +45,52 @@ class UserCreateSerializer(DjoserUserCreateSerializer):
         return value
 
 
-class UserSerializer(DjoserUserSerializer):
+class ProfiledDataMixin:
+    """Засекает сериализацию как этап serialize профиля запроса."""
+
+    @property
+    def data(self):
+        with measure('serialize'):
+            return super().data
+
+
+class PrimingListSerializer(ProfiledDataMixin, serializers.ListSerializer):
+    """Перед сериализацией страницы заполняет резолверы контекста."""
+
+    def to_representation(self, data):
+        iterable = list(data.all() if isinstance(data, Manager) else data)
+        self.child.prime(iterable)
+        return super().to_representation(iterable)
+
+
+class RecipeListSerializer(PrimingListSerializer):
+    """Страница рецептов: общая часть читается из кеша одним get_many."""
+
+    def to_representation(self, data):
+        iterable = list(data.all() if isinstance(data, Manager) else data)
+        return self.child.render_many(iterable)
+
+
+class UserSerializer(ProfiledDataMixin, DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    followers_count = serializers.IntegerField(read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
         fields = (
-            'id', 'username', 'email',
-            'first_name', 'last_name', 'is_subscribed'
+            'id', 'username', 'email', 'first_name', 'last_name',
+            'is_subscribed', 'followers_count', 'recipes_count'
         )
+        list_serializer_class = PrimingListSerializer
+        # updated_at автора входит в ключ кеша общей части рецепта.
+        plan_fields = ('updated_at',)
+
+    def prime(self, users):
+        get_subscriptions(self.context).prime(user.id for user in users)
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.following.filter(user=user).exists()
-        return False
+        return obj.id in get_subscriptions(self.context)
 
     def validate_username(self, value):
         pattern = re.compile('^[\\w]{3,}')
@@ -62,6 +109,18 @@ class UserSerializer(DjoserUserSerializer):
         return super().validate(data)
 
 
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для пакетного добавления или удаления."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
 class ChangePasswordSerializer(serializers.Serializer):
     current_password = serializers.CharField()
     new_password = serializers.CharField()
@@ -116,7 +175,7 @@ class TagSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(ProfiledDataMixin, serializers.ModelSerializer):
     """Сериализатор рецептов."""
     tags = TagSerializer(
         read_only=True,
@@ -134,26 +193,145 @@ class RecipeSerializer(serializers.ModelSerializer):
         required=False,
         allow_null=True
     )
+    image_thumbnail = serializers.ImageField(read_only=True)
+    image_webp = serializers.ImageField(read_only=True)
     cooking_time = serializers.IntegerField(source='cook_time')
+    favorites_count = serializers.IntegerField(read_only=True)
+    carts_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_thumbnail',
+            'image_webp', 'text', 'cooking_time', 'favorites_count',
+            'carts_count'
         )
+        list_serializer_class = RecipeListSerializer
+        # updated_at входит в ключ кеша общей части рецепта.
+        plan_fields = ('updated_at',)
+
+    # Наследники с другим набором полей кеш отключают.
+    shared_cache = True
+
+    def prime(self, recipes):
+        recipe_ids = [recipe.id for recipe in recipes]
+        prime_together(
+            (get_favorites(self.context), recipe_ids),
+            (get_shopping_cart(self.context), recipe_ids),
+            (get_subscriptions(self.context),
+             [recipe.author_id for recipe in recipes]),
+        )
+
+    def to_representation(self, instance):
+        return self.render_many([instance])[0]
+
+    def render_many(self, recipes):
+        """Представления рецептов с флагами пользователя запроса.
+
+        Общая для всех зрителей часть берётся из кеша (load_shared),
+        флаги is_favorited, is_in_shopping_cart и author.is_subscribed
+        накладываются поверх по резолверам, заполненным одним запросом,
+        счётчики — из строк самих рецептов и авторов.
+        """
+        self.prime(recipes)
+        if not self.shared_cache:
+            return [self.render(recipe) for recipe in recipes]
+        shared = self.load_shared(recipes)
+        return [
+            self.with_flags(
+                shared[recipe.pk], recipe,
+                favorited=recipe.id in get_favorites(self.context),
+                in_cart=recipe.id in get_shopping_cart(self.context),
+                subscribed=(recipe.author_id
+                            in get_subscriptions(self.context)),
+            )
+            for recipe in recipes
+        ]
+
+    def load_shared(self, recipes):
+        """Общая часть рецептов: {pk: данные}.
+
+        Кеш читается одним get_many, промахи собираются быстрым путём
+        recipe_data по строкам тегов и ингредиентов. Прочитанное
+        запоминается в контексте, чтобы вложенные списки страницы
+        не ходили в кеш повторно.
+        """
+        loaded = self.context.setdefault('shared_recipes', {})
+        namespace = self.get_shared_namespace()
+        keys = {}
+        for recipe in recipes:
+            key = self.get_shared_key(recipe, namespace)
+            if key not in loaded:
+                keys[key] = recipe
+
+        def build(missing):
+            tags, ingredients = load_recipe_relations(
+                [keys[key].pk for key in missing])
+            request = self.context.get('request')
+            return {
+                key: recipe_data(keys[key], tags[keys[key].pk],
+                                 ingredients[keys[key].pk], request)
+                for key in missing
+            }
+
+        if keys:
+            loaded.update(get_many_or_build(list(keys), build))
+        return {
+            recipe.pk: loaded[self.get_shared_key(recipe, namespace)]
+            for recipe in recipes
+        }
+
+    def render(self, instance):
+        """Представление полями DRF, без кеша и быстрого пути."""
+        return super().to_representation(instance)
+
+    @staticmethod
+    def get_shared_key(recipe, namespace):
+        return (f'rendered-recipe:{recipe.pk}:'
+                f'{recipe.updated_at.timestamp()}:'
+                f'{recipe.author.updated_at.timestamp()}:{namespace}')
+
+    def get_shared_namespace(self):
+        """Часть ключа кеша: версии данных и адрес сайта для картинок."""
+        namespace = self.context.get('shared_recipe_namespace')
+        if namespace is None:
+            request = self.context.get('request')
+            parts = [request.build_absolute_uri('/') if request else '']
+            parts.extend(f'{name}:{get_version(name)}'
+                         for name in SHARED_RECIPE_VERSIONS)
+            namespace = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+            self.context['shared_recipe_namespace'] = namespace
+        return namespace
+
+    @staticmethod
+    def with_flags(data, recipe, favorited=False, in_cart=False,
+                   subscribed=False):
+        """Общая часть с флагами зрителя и текущими счётчиками recipe.
+
+        Лайк, покупка или подписка меняют только счётчики и не
+        перестраивают закешированную общую часть.
+        """
+        author = recipe.author
+        return {
+            **data,
+            'is_favorited': favorited,
+            'is_in_shopping_cart': in_cart,
+            'favorites_count': recipe.favorites_count,
+            'carts_count': recipe.carts_count,
+            'author': {
+                **data['author'],
+                'is_subscribed': subscribed,
+                'followers_count': author.followers_count,
+                'recipes_count': author.recipes_count,
+            },
+        }
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return obj.id in self.context['liked']
-        return False
+        return obj.id in get_favorites(self.context)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return obj.id in self.context['to_buy']
-        return False
+        return obj.id in get_shopping_cart(self.context)
 
     def validate_recipe(self, value):
         user = self.request.user
@@ -171,19 +349,27 @@ class RecipeCreateSerializer(RecipeSerializer):
     tags = serializers.PrimaryKeyRelatedField(many=True,
                                               queryset=Tag.objects.all().only(
                                                   'id'))
+    shared_cache = False
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe_id=recipe.id, ingredients=ingredients)
+        push_recipe(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients', [])
         tags = validated_data.pop('tags', [])
-        super().update(instance, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Полный save() записал бы прочитанные до правки счётчики
+        # избранного и покупок поверх изменённых за это время.
+        instance.save(update_fields=[*validated_data, 'updated_at'])
         if tags:
             instance.tags.set(tags)
 
@@ -206,6 +392,9 @@ class RecipeCreateSerializer(RecipeSerializer):
                 )
             )
         IngredientSum.objects.bulk_create(new_ingredients)
+        # bulk_create не шлёт post_save, и touch_recipe_ingredients
+        # не сработает: дату изменения рецепта двигаем сами.
+        touch_recipes((recipe_id,))
 
     def validate_ingredients(self, ingredients):
         ingredient_ids = []
@@ -227,8 +416,6 @@ class FollowSerializer(UserSerializer):
     '''Сериализатор подписoк.'''
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     recipes = RecipeSerializer(read_only=True, many=True)
-    recipes_count = serializers.IntegerField(
-        source='recipes.count', read_only=True)
 
     class Meta:
         model = User
@@ -236,6 +423,24 @@ class FollowSerializer(UserSerializer):
             'email', 'id', 'username', 'first_name', 'last_name',
             'is_subscribed', 'recipes', 'recipes_count'
         )
+        list_serializer_class = PrimingListSerializer
+
+    def prime(self, users):
+        super().prime(users)
+        recipes = [recipe for user in users for recipe in user.recipes.all()]
+        self.fields['recipes'].child.prime(recipes)
+        self.fields['recipes'].child.load_shared(recipes)
+
+    def to_representation(self, instance):
+        return follow_data(
+            instance,
+            self.fields['recipes'].to_representation(instance.recipes),
+            subscribed=instance.id in get_subscriptions(self.context),
+        )
+
+    def render(self, instance):
+        """Представление полями DRF, без быстрого пути."""
+        return super().to_representation(instance)
 
     def get_recipes(self, obj):
         recipes = obj.recipes.all()
@@ -0,0 +1,53 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import BuyList, Ingredient, Liked, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from users.models import Follow, User
+
+from .authentication import token_cache
+from .cache import bump_version, user_state_name
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    bump_version('ingredients')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_version('tags')
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_users(update_fields=None, **kwargs):
+    # Вход в систему обновляет только last_login, в выдачу он не попадает.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_version('users')
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_user_tokens(instance, update_fields=None, **kwargs):
+    # Смена пароля, блокировка и удаление должны действовать сразу.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(instance, **kwargs):
+    # Выход через djoser удаляет токены пользователя.
+    token_cache.invalidate_user(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=Liked)
+@receiver((post_save, post_delete), sender=BuyList)
+@receiver((post_save, post_delete), sender=Follow)
+def invalidate_user_state(instance, **kwargs):
+    bump_version(user_state_name(instance.user_id))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes(**kwargs):
+    bump_version('recipes')
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from api.async_views import async_urlpatterns
+from api.views import (IngredientViewSet, ProfileViewSet, RecipeViewSet,
+                       TagViewSet, UserViewSet)
 from djoser.views import TokenCreateView, TokenDestroyView
 
 
@@ -11,6 +14,7 @@ router.register('users', UserViewSet, basename='users')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
+router.register('profiles', ProfileViewSet, basename='profiles')
 
 urlpatterns = [
     path('auth/', include('djoser.urls')),
@@ -21,3 +25,6 @@ urlpatterns = [
 ]
 
 urlpatterns += router.urls
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_urlpatterns(urlpatterns)
@@ -1,24 +1,41 @@
 # я исправила уже всё, что только можно было.
 # нашла причину ошибки, нашла поломанный сериализатор рецептов
 # и еще кучу всего. школьники с ютуба круче меня(
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.db.models import Prefetch, Subquery
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Sum
+from django.db.models import prefetch_related_objects
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly
                                         )
-from recipes.models import (BuyList, Ingredient, IngredientSum,
+from recipes.models import (BuyList, FeedEntry, Ingredient, IngredientSum,
                             Liked, Recipe, Tag)
 from users.models import Follow, User
 
-from .filters import IngredientFilter, RecipeFilter
-from .paginator import LimitPageNumberPagination
-from .serializers import (UserSerializer,
+from .authentication import token_cache
+from .cache import bump_version, get_rendered_json, user_state_name
+from .counters import recount
+from .feed import backfill, remove_authors
+from .filters import IngredientFilter, RecipeFilter, StableOrderingFilter
+from .indexes import ingredient_index
+from .mixins import ConditionalGetMixin
+from .paginator import LimitPagination
+from .planner import get_query_plan, limit_per_group
+from .profiling import get_profiles
+from .renderers import (ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+                        ShoppingListTextRenderer)
+from .serializers import (BulkIdsSerializer,
+                          UserSerializer,
                           IngredientSerializer,
                           TagSerializer,
                           RecipeSerializer,
@@ -28,17 +45,95 @@ from .serializers import (UserSerializer,
                           RecipeCreateSerializer
                           )
 
+SHOPPING_LIST_CHUNK_SIZE: int = 500
+
+
+def change_relations(request, model, field, targets, counter, **touch):
+    """Пакетно добавляет или удаляет связи пользователя запроса.
+
+    model — модель связи (Liked, BuyList, Follow), field — её поле
+    с объектом, targets — queryset объектов, на которые можно
+    сослаться. POST стоит SELECT + INSERT, DELETE — SELECT + DELETE
+    (и выборку строк для post_delete), плюс UPDATE счётчика у
+    затронутых объектов. Повтор запроса ничего
+    не меняет. В ответе статус по каждому id: added / exists /
+    not_found для POST и removed / missing для DELETE.
+    """
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data['ids']
+    user = request.user
+    relations = model.objects.filter(user=user)
+
+    if request.method == 'POST':
+        found = dict(
+            targets.filter(pk__in=ids)
+            .annotate(related=Exists(
+                relations.filter(**{field: OuterRef('pk')})))
+            .values_list('pk', 'related')
+        )
+        changed = [pk for pk, related in found.items() if not related]
+        results = {pk: 'not_found' for pk in ids}
+        results.update(
+            (pk, 'exists' if related else 'added')
+            for pk, related in found.items()
+        )
+        with transaction.atomic():
+            # Гонка с параллельным запросом упрётся в уникальный индекс
+            # и будет пропущена, счётчик ниже пересчитывается по факту.
+            model.objects.bulk_create(
+                [model(user=user, **{f'{field}_id': pk}) for pk in changed],
+                ignore_conflicts=True,
+            )
+            if changed:
+                recount(targets.model.objects.filter(pk__in=changed),
+                        counter, model, field, **touch)
+        # bulk_create не шлёт post_save, версию состояния меняем сами.
+        bump_version(user_state_name(user.pk))
+        response_status = (status.HTTP_201_CREATED if changed
+                           else status.HTTP_200_OK)
+    else:
+        lookup = f'{field}_id__in'
+        changed = list(
+            relations.filter(**{lookup: ids})
+            .values_list(f'{field}_id', flat=True)
+        )
+        with transaction.atomic():
+            relations.filter(**{lookup: changed}).delete()
+            if changed:
+                recount(targets.model.objects.filter(pk__in=changed),
+                        counter, model, field, **touch)
+        results = {pk: 'missing' for pk in ids}
+        results.update((pk, 'removed') for pk in changed)
+        response_status = status.HTTP_200_OK
+
+    return Response(
+        {'results': [{'id': pk, 'status': results[pk]} for pk in ids]},
+        status=response_status,
+    )
+
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    pagination_class = LimitPageNumberPagination
+    pagination_class = LimitPagination
+    filter_backends = (StableOrderingFilter,)
+    ordering_fields = ('id', 'followers_count', 'recipes_count')
+    ordering = ('-id',)
+    count_versions = ('users',)
+    user_count_actions = ('subscriptions',)
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial']:
             return UserCreateSerializer
         return UserSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            return get_query_plan(UserSerializer).apply(queryset)
+        return queryset
+
     @action(detail=False, methods=['GET'],
             permission_classes=[IsAuthenticated])
     def me(self, *args, **kwargs):
@@ -56,7 +151,9 @@ class UserViewSet(viewsets.ModelViewSet):
         self.request.user.set_password(
             serializer.validated_data['new_password']
         )
-        self.request.user.save()
+        # Пользователь запроса может быть снимком из кеша токенов,
+        # его счётчики сохранять нельзя.
+        self.request.user.save(update_fields=['password'])
         return Response(
             data={
                 'status': f'Set new password '
@@ -68,37 +165,102 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['GET'],
             permission_classes=[IsAuthenticated])
     def subscriptions(self, *args, **kwargs):
-        recipes_limit = int(self.request.GET.get('recipes_limit'))
-        subquery = Subquery(
-            Recipe.objects.order_by('-pub_date')
-            .values_list('id', flat=True)[:recipes_limit + 1]
-        )
-        queryset = User.objects.filter(
-            following__user=self.request.user
-        ).prefetch_related(
-            Prefetch('recipes',
-                     queryset=Recipe.objects.filter(id__in=subquery))
-        )[:recipes_limit]
-        page = self.paginate_queryset(queryset)
+        recipes_limit = self.get_recipes_limit()
+        page = self.paginate_queryset(self.get_subscriptions_queryset())
+        prefetch_related_objects(
+            page, self.get_recipes_prefetch(page, recipes_limit))
         serializer = FollowSerializer(page,
                                       context={'request': self.request},
                                       many=True)
         return self.get_paginated_response(serializer.data)
 
+    def get_subscriptions_queryset(self):
+        return get_query_plan(FollowSerializer).apply(
+            User.objects.filter(following__user=self.request.user)
+            .order_by('-id'),
+            prefetch=False,
+            # Prefetch рецептов подставляет автором объект страницы,
+            # а вложенный UserSerializer выводит followers_count;
+            # updated_at входит в ключ кеша общей части рецепта.
+            fields=('followers_count', 'updated_at'),
+        )
+
+    def get_recipes_prefetch(self, authors, recipes_limit):
+        """Prefetch рецептов авторов, не больше recipes_limit на автора."""
+        recipes = get_query_plan(RecipeSerializer).apply(
+            Recipe.objects.all(), prefetch=False)
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=limit_per_group(
+                Recipe.objects.filter(
+                    author_id__in=[author.id for author in authors]),
+                partition_by='author_id',
+                order_by=F('pub_date').desc(),
+                limit=recipes_limit,
+            ))
+        return Prefetch('recipes', queryset=recipes)
+
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            raise ValidationError(
+                {'recipes_limit': 'Ожидается целое число.'})
+        if recipes_limit < 0:
+            raise ValidationError(
+                {'recipes_limit': 'Значение не может быть отрицательным.'})
+        return recipes_limit
+
     @action(detail=True, methods=['POST', 'DELETE'],
             permission_classes=[IsAuthenticated])
     def subscribe(self, *args, **kwargs):
         author = get_object_or_404(User, id=kwargs['pk'])
+        counted = User.objects.filter(pk=author.pk)
         if self.request.method == 'POST':
-            Follow.objects.create(author=author, user=self.request.user)
+            with transaction.atomic():
+                _, created = Follow.objects.get_or_create(
+                    author=author, user=self.request.user)
+                if not created:
+                    raise ValidationError({'errors': 'Вы уже подписаны.'})
+                # Счётчик выводится в рецептах автора, дата меняет
+                # их ETag.
+                counted.update(followers_count=F('followers_count') + 1,
+                               counters_updated_at=timezone.now())
+                backfill(self.request.user, (author.pk,))
+            author.refresh_from_db(fields=('followers_count',))
             serializer = UserSerializer(author,
                                         context={'request': self.request})
             return Response(serializer.data, status.HTTP_201_CREATED)
 
-        Follow.objects.filter(author=author,
-                              user=self.request.user).delete()
+        with transaction.atomic():
+            deleted, _ = Follow.objects.filter(
+                author=author, user=self.request.user).delete()
+            if deleted:
+                counted.update(followers_count=F('followers_count') - 1,
+                               counters_updated_at=timezone.now())
+                remove_authors(self.request.user, (author.pk,))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='subscribe', url_name='subscribe-many',
+            permission_classes=[IsAuthenticated])
+    def subscribe_many(self, request):
+        with transaction.atomic():
+            response = change_relations(
+                request, Follow, 'author',
+                User.objects.exclude(pk=request.user.pk),
+                'followers_count', counters_updated_at=timezone.now(),
+            )
+            changed = [item['id'] for item in response.data['results']
+                       if item['status'] in ('added', 'removed')]
+            if request.method == 'POST':
+                backfill(request.user, changed)
+            else:
+                remove_authors(request.user, changed)
+        return response
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет тегов."""
@@ -106,6 +268,22 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        # Готовый JSON из кеша отдаётся только обычному JSON-клиенту;
+        # другие форматы (?format=api, параметры в Accept) проходят
+        # через согласование содержимого DRF.
+        if request.accepted_media_type != JSONRenderer.media_type:
+            return super().list(request, *args, **kwargs)
+        content, etag = get_rendered_json(
+            'tags',
+            lambda: TagSerializer(self.get_queryset(), many=True).data,
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингредиентов."""
@@ -116,100 +294,188 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ('^name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(IngredientFilter.search_param)
+        if name is None:
+            return Response(ingredient_index.all())
+        return Response(ingredient_index.search(name))
+
+
+class ProfileViewSet(viewsets.ViewSet):
+    """Последние профили запросов и статистика кеша токенов, только
+    для персонала."""
+    permission_classes = (IsAdminUser,)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def list(self, request):
+        return Response({
+            'enabled': settings.PROFILING,
+            'token_cache': token_cache.stats(),
+            'results': get_profiles(),
+        })
+
+
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Вьюсет рецептов."""
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    pagination_class = LimitPageNumberPagination
-    filter_backends = (DjangoFilterBackend,)
+    pagination_class = LimitPagination
+    filter_backends = (DjangoFilterBackend, StableOrderingFilter)
+    ordering_fields = ('pub_date', 'favorites_count', 'carts_count')
+    ordering = ('-pub_date', '-id')
     filterset_class = RecipeFilter
+    conditional_versions = ('tags', 'ingredients', 'recipes')
+    conditional_fields = ('updated_at', 'author__updated_at',
+                          'counters_updated_at',
+                          'author__counters_updated_at')
+    count_versions = ('recipes',)
+    user_count_actions = ('feed',)
+    user_count_params = ('is_favorited', 'is_in_shopping_cart')
 
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
             return RecipeSerializer
         return RecipeCreateSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Связи догружает сериализатор и только для рецептов,
+            # которых нет в кеше.
+            return get_query_plan(RecipeSerializer).apply(
+                queryset,
+                prefetch=False,
+                fields=self.ordering_fields,
+            )
+        return queryset
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
-
-    def get_serializer_context(self):
-        context = {
-            'request': self.request,
-            'format': self.format_kwarg,
-            'view': self,
-            'is_favorited': set(),
-            'is_in_shopping_cart': set()
-        }
-        user = self.request.user
-        if user.is_authenticated:
-            context['liked'] = set(Liked.objects.filter(
-                user=user
-            ).values_list('recipe_id', flat=True))
-            context['to_buy'] = set(BuyList.objects.filter(
-                user=user
-            ).values_list('recipe_id', flat=True))
-        return context
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
+            # recipes_count автора выводится в каждом его рецепте.
+            User.objects.filter(pk=self.request.user.pk).update(
+                recipes_count=F('recipes_count') + 1,
+                counters_updated_at=timezone.now())
 
-    @action(detail=True,
-            methods=['post', 'delete'],
-            permission_classes=[IsAuthenticated])
-    def favorite(self, request, pk=None):
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            User.objects.filter(pk=instance.author_id).update(
+                recipes_count=F('recipes_count') - 1,
+                counters_updated_at=timezone.now())
+
+    def relate(self, model, counter, pk):
+        """Добавляет рецепт в список пользователя или убирает из него.
+
+        Счётчик рецепта меняется через F() в той же транзакции,
+        counters_updated_at сдвигается, чтобы сменился ETag рецепта.
+        """
         user = self.request.user
         recipe = get_object_or_404(Recipe, id=pk)
+        counted = Recipe.objects.filter(pk=recipe.pk)
 
         if self.request.method == 'POST':
-            Liked.objects.create(user=user, recipe=recipe)
+            with transaction.atomic():
+                _, created = model.objects.get_or_create(
+                    user=user, recipe=recipe)
+                if not created:
+                    raise ValidationError({'errors': 'Рецепт уже добавлен.'})
+                counted.update(**{counter: F(counter) + 1},
+                               counters_updated_at=timezone.now())
+            recipe.refresh_from_db(fields=(counter,))
             serializer = RecipeSerializer(
                 recipe, context=self.get_serializer_context())
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        if self.request.method == 'DELETE':
-            is_liked = get_object_or_404(Liked, user=user, recipe=recipe)
-            is_liked.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        # Удаляем одним запросом и уменьшаем счётчик, только если строка
+        # действительно удалена: два одновременных DELETE иначе оба
+        # прошли бы проверку и уменьшили его дважды.
+        with transaction.atomic():
+            deleted, _ = model.objects.filter(
+                user=user, recipe=recipe).delete()
+            if deleted:
+                counted.update(**{counter: F(counter) - 1},
+                               counters_updated_at=timezone.now())
+        if not deleted:
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True,
+            methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated])
+    def favorite(self, request, pk=None):
+        return self.relate(Liked, 'favorites_count', pk)
 
     @action(detail=True,
             methods=['post', 'delete'],
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk=None):
-        user = self.request.user
-        recipe = get_object_or_404(Recipe, id=pk)
+        return self.relate(BuyList, 'carts_count', pk)
 
-        if self.request.method == 'POST':
-            BuyList.objects.create(user=user, recipe=recipe)
-            serializer = RecipeSerializer(
-                recipe, context=self.get_serializer_context())
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='favorite', url_name='favorite-many',
+            permission_classes=[IsAuthenticated])
+    def favorite_many(self, request):
+        return change_relations(request, Liked, 'recipe', Recipe.objects,
+                                'favorites_count',
+                                counters_updated_at=timezone.now())
 
-        if self.request.method == 'DELETE':
-            shopping_cart = get_object_or_404(
-                BuyList, user=user, recipe=recipe)
-            shopping_cart.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='shopping_cart', url_name='shopping-cart-many',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_many(self, request):
+        return change_relations(request, BuyList, 'recipe', Recipe.objects,
+                                'carts_count',
+                                counters_updated_at=timezone.now())
 
     @action(detail=False, methods=['get'],
-            permission_classes=(IsAuthenticated,))
+            permission_classes=(IsAuthenticated,),
+            filter_backends=())
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые сверху.
+
+        Страница читается из FeedEntry по индексу пользователя, рецепты
+        догружаются по первичному ключу с планом RecipeSerializer, связи —
+        только для тех, которых нет в кеше.
+        """
+        entries = (FeedEntry.objects.filter(user=request.user)
+                   .only('id', 'recipe_id', 'pub_date')
+                   .order_by(*self.ordering))
+        page = self.paginate_queryset(entries)
+        recipes = get_query_plan(RecipeSerializer).apply(
+            Recipe.objects.filter(pk__in=[entry.recipe_id for entry in page]),
+            prefetch=False,
+        )
+        recipes = {recipe.pk: recipe for recipe in recipes}
+        serializer = RecipeSerializer(
+            [recipes[entry.recipe_id] for entry in page
+             if entry.recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=(ShoppingListTextRenderer,
+                              ShoppingListCSVRenderer,
+                              ShoppingListJSONRenderer))
     def download_shopping_cart(self, request):
         ingredients = (
             IngredientSum.objects
             .filter(recipe__to_buy__user=request.user)
-            .select_related('recipe')
-            .annotate(total_sum=Sum('sum'))
-            .values_list('ingredient__name', 'total_sum',
+            .values_list('ingredient__name',
                          'ingredient__unit_of_measurement')
+            .annotate(total_sum=Sum('sum'))
+            .order_by('ingredient__name', 'ingredient__unit_of_measurement')
         )
-        data = []
-        for ingredient in ingredients:
-            data.append(
-                f'{ingredient[0]} - '
-                f'{ingredient[1]} '
-                f'{ingredient[2]}'
-            )
-        content = 'Список покупок:\n\n' + '\n'.join(data)
-        filename = 'buy_list.txt'
-        request = HttpResponse(content, content_type='text/plain')
-        request['Content-Disposition'] = f'attachment; filename={filename}'
-        return request
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(
+                ingredients.iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={renderer.filename}.{renderer.format}')
+        return response
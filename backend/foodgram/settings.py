@@ -29,6 +29,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.ProfilingMiddleware',
+    'api.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,10 +67,48 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', 'db'),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 0)),
     }
 }
 
+# Общий кеш процессов: версии данных, отрендеренные ответы, счётчики
+# и закрепления клиентов за основной базой. MEMCACHED_LOCATION=host:port
+# (можно несколько через запятую); без него у каждого процесса свой
+# кеш в памяти, что годится только для разработки и тестов.
+MEMCACHED_LOCATION = os.getenv('MEMCACHED_LOCATION', '')
+if MEMCACHED_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': MEMCACHED_LOCATION.split(','),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Реплики для чтения: DB_REPLICA_HOSTS=host[:port],... Остальные
+# параметры подключения как у основной базы.
+REPLICA_DATABASES = []
+for number, address in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    host, _, port = address.strip().partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает из основной базы.
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -89,7 +129,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
@@ -112,6 +152,31 @@ STATIC_ROOT = '/var/html/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/var/html/media/'
 
+# Картинки рецептов приходят в JSON в base64, тело запроса длиннее
+# самой картинки примерно на треть.
+MAX_IMAGE_SIZE = 5 * 1024 * 1024
+DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_IMAGE_SIZE * 4 // 3 + 1024 * 1024
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+# Профилирование запросов: заголовок Server-Timing и последние
+# PROFILING_BUFFER_SIZE профилей на /api/profiles/ для персонала.
+PROFILING = os.getenv('PROFILING', 'False') == 'True'
+PROFILING_BUFFER_SIZE = int(os.getenv('PROFILING_BUFFER_SIZE', 200))
+
+# Асинхронные версии горячих GET-эндпоинтов, имеет смысл включать
+# только под ASGI. Синхронные шаги выполняются в пуле из
+# ASYNC_DB_WORKERS потоков, у каждого своё соединение с базой, поэтому
+# вместе с ними обязателен CONN_MAX_AGE больше нуля. ProfilingMiddleware
+# синхронный и с ним запросы снова обрабатываются по одному.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+ASYNC_DB_WORKERS = int(os.getenv('ASYNC_DB_WORKERS', 8))
+
+# Кеш токенов в памяти процесса. Выход, смена пароля и блокировка
+# поднимают версию токенов пользователя в общем кеше (CACHES), и все
+# процессы сбрасывают его снимки при следующем запросе.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 30))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 DJOSER = {
@@ -23,13 +23,13 @@ class TagAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('author', 'id', 'name',)
+    list_display = ('author', 'id', 'name', 'get_liked')
     list_filter = ('author', 'name', 'tags')
     empty_value_display = '-пусто-'
 
-    @staticmethod
-    def get_liked(obj):
-        return obj.liked.count()
+    @admin.display(description='В избранном', ordering='favorites_count')
+    def get_liked(self, obj):
+        return obj.favorites_count
 
 
 @admin.register(Liked)
@@ -0,0 +1,111 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE: tuple = (480, 480)
+WEBP_SIZE: tuple = (1280, 1280)
+JPEG_QUALITY: int = 80
+WEBP_QUALITY: int = 80
+
+# Поле варианта, каталог, формат Pillow, расширение, размер, параметры.
+VARIANTS = (
+    ('image_thumbnail', 'recipes/thumbnails', 'JPEG', 'jpg', THUMBNAIL_SIZE,
+     {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True}),
+    ('image_webp', 'recipes/webp', 'WEBP', 'webp', WEBP_SIZE,
+     {'quality': WEBP_QUALITY, 'method': 4}),
+)
+
+_executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS,
+                               thread_name_prefix='recipe-images')
+
+
+def variant_names(image_name):
+    """Имена файлов вариантов, которые соответствуют оригиналу."""
+    if not image_name:
+        return {field: '' for field, *_ in VARIANTS}
+    stem = PurePosixPath(image_name).stem
+    return {
+        field: f'{directory}/{stem}.{extension}'
+        for field, directory, _, extension, _, _ in VARIANTS
+    }
+
+
+def variants_outdated(recipe):
+    """Варианты не совпадают с текущей картинкой рецепта."""
+    expected = variant_names(recipe.image.name)
+    return any(getattr(recipe, field).name != name
+               for field, name in expected.items())
+
+
+def render_variant(source, image_format, size, options):
+    image = source.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def build_variants(recipe_id, image_name):
+    """Строит миниатюру и WebP для картинки рецепта.
+
+    Если картинку успели заменить, работа пропускается: новый вариант
+    уже поставлен в очередь сохранением рецепта.
+    """
+    recipe = (Recipe.objects
+              .only('image', 'image_thumbnail', 'image_webp')
+              .filter(pk=recipe_id).first())
+    if recipe is None or recipe.image.name != image_name:
+        return
+    storage = recipe.image.storage
+    names = variant_names(image_name)
+    stale = {getattr(recipe, field).name for field in names} - {''}
+
+    if image_name:
+        with recipe.image.open('rb') as file:
+            source = Image.open(file)
+            source.load()
+        source = ImageOps.exif_transpose(source)
+        for field, _, image_format, _, size, options in VARIANTS:
+            if image_format == 'WEBP' and not features.check('webp'):
+                names[field] = ''
+                continue
+            if storage.exists(names[field]):
+                storage.delete(names[field])
+            names[field] = storage.save(names[field], ContentFile(
+                render_variant(source, image_format, size, options)))
+
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        updated_at=timezone.now(), **names)
+    if updated:
+        for name in stale - set(names.values()):
+            storage.delete(name)
+
+
+def run_build_variants(recipe_id, image_name):
+    close_old_connections()
+    try:
+        build_variants(recipe_id, image_name)
+    except Exception:
+        logger.exception('Не удалось построить варианты картинки рецепта %s',
+                         recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(recipe_id, image_name):
+    """Ставит построение вариантов в пул после коммита транзакции."""
+    transaction.on_commit(
+        lambda: _executor.submit(run_build_variants, recipe_id, image_name))
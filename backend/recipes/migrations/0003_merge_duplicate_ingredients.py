@@ -0,0 +1,64 @@
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def collapse_rows(model, keep_id, ingredient_ids, amount=None):
+    """Оставляет у каждого рецепта одну строку на группу дублей.
+
+    Лишние строки удаляются, их количество (``amount``) суммируется
+    в оставшуюся, после чего все строки группы указывают на ``keep_id``.
+    """
+    rows = model.objects.filter(ingredient_id__in=ingredient_ids)
+    annotations = {'row_id': Min('id'), 'rows': Count('id')}
+    if amount:
+        annotations['total'] = Sum(amount)
+    collapsed = (
+        rows.values('recipe_id').annotate(**annotations).filter(rows__gt=1)
+    )
+    for group in list(collapsed):
+        rows.filter(recipe_id=group['recipe_id']).exclude(
+            id=group['row_id']).delete()
+        changes = {'ingredient_id': keep_id}
+        if amount:
+            changes[amount] = group['total']
+        model.objects.filter(id=group['row_id']).update(**changes)
+    rows.exclude(ingredient_id=keep_id).update(ingredient_id=keep_id)
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Сводит дубли ингредиентов к записи с минимальным id."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientSum = apps.get_model('recipes', 'IngredientSum')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    duplicates = (
+        Ingredient.objects
+        .values('name', 'unit_of_measurement')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates:
+        ingredient_ids = list(
+            Ingredient.objects
+            .filter(name=group['name'],
+                    unit_of_measurement=group['unit_of_measurement'])
+            .values_list('id', flat=True)
+        )
+        keep_id = group['keep_id']
+        collapse_rows(IngredientSum, keep_id, ingredient_ids, amount='sum')
+        collapse_rows(Recipe.ingredients.through, keep_id, ingredient_ids)
+        Ingredient.objects.filter(id__in=ingredient_ids).exclude(
+            id=keep_id).delete()
+
+
+class Migration(migrations.Migration):
+    # Удаление ингредиентов оставляет отложенные проверки внешних ключей,
+    # поэтому ограничение добавляется отдельной миграцией (0004).
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+    ]
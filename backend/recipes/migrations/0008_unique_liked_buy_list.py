@@ -0,0 +1,44 @@
+# Generated by Django 3.2.3 on 2026-10-18 04:32
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicates(apps, schema_editor):
+    """Оставляет по одной записи (user, recipe) и пересчитывает счётчики."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    counters = (
+        (apps.get_model('recipes', 'Liked'), 'favorites_count'),
+        (apps.get_model('recipes', 'BuyList'), 'carts_count'),
+    )
+    for model, counter in counters:
+        keep_ids = (
+            model.objects.values('user', 'recipe')
+            .annotate(keep_id=Min('id')).values('keep_id')
+        )
+        model.objects.exclude(id__in=keep_ids).delete()
+        Recipe.objects.update(**{counter: Coalesce(Subquery(
+            model.objects.filter(recipe=OuterRef('pk'))
+            .order_by().values('recipe')
+            .annotate(total=Count('pk')).values('total')
+        ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='buylist',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_buy_list'),
+        ),
+        migrations.AddConstraint(
+            model_name='liked',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_liked'),
+        ),
+    ]
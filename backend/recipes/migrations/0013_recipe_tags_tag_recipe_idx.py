@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Составной индекс (tag_id, recipe_id) на автоматической таблице
+    связей рецептов и тегов: фильтр по тегам проверяет наличие связи
+    для рецепта одним поиском по индексу.
+    """
+
+    dependencies = [
+        ('recipes', '0012_ingredientsum_ingredient_recipe_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX recipes_recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipes_recipe_tags_tag_recipe_idx',
+        ),
+    ]
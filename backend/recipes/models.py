@@ -1,5 +1,7 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 from users.models import User
 
@@ -26,6 +28,10 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'unit_of_measurement'],
+                name='unique_ingredient_unit')]
 
     def __str__(self):
         return f'{self.name}, {self.unit_of_measurement}'
@@ -73,6 +79,18 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name='Изображение',
     )
+    image_thumbnail = models.ImageField(
+        blank=True,
+        editable=False,
+        upload_to='recipes/thumbnails/',
+        verbose_name='Миниатюра',
+    )
+    image_webp = models.ImageField(
+        blank=True,
+        editable=False,
+        upload_to='recipes/webp/',
+        verbose_name='Изображение WebP',
+    )
     text = models.TextField(
         verbose_name='Описание',
     )
@@ -96,11 +114,41 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    # Сдвигается вместе со счётчиками: входит в ETag, но не в ключ
+    # кеша общей части рецепта.
+    counters_updated_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name='Дата изменения счётчиков',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок',
+    )
+    # Заполняется только в PostgreSQL, GIN-индекс создаёт миграция 0011.
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -133,6 +181,12 @@ class IngredientSum(models.Model):
             models.UniqueConstraint(
                 fields=['recipe', 'ingredient'],
                 name='unique ingredient')]
+        # Обратный индекс «ингредиент -> рецепты» для подбора рецептов
+        # по продуктам: отбор идёт по индексу без чтения таблицы.
+        indexes = [
+            models.Index(fields=['ingredient', 'recipe'],
+                         name='ingredientsum_ingr_recipe_idx'),
+        ]
 
     def __str__(self):
         return f'{self.ingredient}: {self.sum}'
@@ -156,6 +210,12 @@ class Liked(models.Model):
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_liked'
+            )
+        ]
 
 
 class BuyList(models.Model):
@@ -176,6 +236,52 @@ class BuyList(models.Model):
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_buy_list'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в Список покупок'
+
+
+class FeedEntry(models.Model):
+    """Запись ленты подписок: рецепт автора, на которого подписан user.
+
+    Заполняется при публикации рецепта (fan-out on write), чтение ленты
+    идёт по индексу (user, -pub_date, -id) без соединения с подписками.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Читатель',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-id'],
+                         name='feed_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
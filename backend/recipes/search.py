@@ -0,0 +1,90 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import (Case, Count, Exists, F, FloatField, OuterRef,
+                              Q, Subquery, Value, When)
+from django.db.models.functions import Cast
+
+from .models import IngredientSum
+
+SEARCH_CONFIG: str = 'russian'
+SEARCH_RANK: str = 'search_rank'
+INGREDIENT_COVERAGE: str = 'ingredient_coverage'
+# Аннотации релевантности, по которым сортируется выдача без ?ordering=.
+RELEVANCE_ANNOTATIONS = (SEARCH_RANK, INGREDIENT_COVERAGE)
+MATCH_ALL: str = 'all'
+MATCH_ANY: str = 'any'
+
+
+def search_supported(using):
+    """Полнотекстовый поиск есть только в PostgreSQL."""
+    return connections[using].vendor == 'postgresql'
+
+
+def search_vector():
+    """tsvector рецепта: название весит больше описания."""
+    return (SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG))
+
+
+def update_search_vector(queryset):
+    """Пересчитывает search_vector у рецептов queryset одним UPDATE."""
+    if search_supported(queryset.db):
+        queryset.update(search_vector=search_vector())
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по тексту и добавляет аннотацию SEARCH_RANK.
+
+    В PostgreSQL поиск идёт по search_vector с GIN-индексом и ранжируется
+    ts_rank. На других базах — icontains по названию и описанию, совпадение
+    в названии ранжируется выше.
+    """
+    if search_supported(queryset.db):
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch')
+        # ts_rank возвращает real; в double precision значение без потерь
+        # проходит через курсор пагинации и обратно.
+        return queryset.filter(search_vector=search_query).annotate(**{
+            SEARCH_RANK: Cast(SearchRank(F('search_vector'), search_query),
+                              FloatField()),
+        })
+    return queryset.filter(
+        Q(name__icontains=query) | Q(text__icontains=query)
+    ).annotate(**{SEARCH_RANK: Case(
+        When(name__icontains=query, then=Value(1.0)),
+        default=Value(0.5),
+        output_field=FloatField(),
+    )})
+
+
+def filter_by_ingredients(queryset, include=(), exclude=(), match=MATCH_ALL):
+    """Рецепты со всеми (MATCH_ALL) или любыми (MATCH_ANY) ингредиентами
+    include и без ингредиентов exclude.
+
+    Пересечение и разность считаются в одном запросе по индексу
+    (ingredient, recipe) таблицы IngredientSum. Для MATCH_ANY рецепты
+    аннотируются числом совпавших ингредиентов INGREDIENT_COVERAGE.
+    """
+    include = set(include)
+    exclude = set(exclude)
+    if include:
+        matched = (IngredientSum.objects
+                   .filter(ingredient_id__in=include)
+                   .order_by().values('recipe_id'))
+        if match == MATCH_ALL:
+            queryset = queryset.filter(pk__in=matched.annotate(
+                total=Count('ingredient_id')
+            ).filter(total=len(include)).values('recipe_id'))
+        else:
+            queryset = queryset.filter(pk__in=matched).annotate(**{
+                INGREDIENT_COVERAGE: Subquery(
+                    matched.filter(recipe_id=OuterRef('pk'))
+                    .annotate(total=Count('ingredient_id'))
+                    .values('total')
+                ),
+            })
+    if exclude:
+        queryset = queryset.exclude(Exists(IngredientSum.objects.filter(
+            recipe_id=OuterRef('pk'), ingredient_id__in=exclude)))
+    return queryset
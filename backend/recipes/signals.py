@@ -0,0 +1,44 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .images import schedule_variants, variants_outdated
+from .models import IngredientSum, Recipe
+from .search import update_search_vector
+
+
+def touch_recipes(recipe_ids):
+    """Обновляет дату изменения рецептов без вызова save()."""
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        updated_at=timezone.now())
+
+
+@receiver((post_save, post_delete), sender=IngredientSum)
+def touch_recipe_ingredients(sender, instance, **kwargs):
+    touch_recipes((instance.recipe_id,))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        touch_recipes((instance.pk,))
+    elif pk_set:
+        touch_recipes(pk_set)
+
+
+@receiver(post_save, sender=Recipe)
+def update_image_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if variants_outdated(instance):
+        schedule_variants(instance.pk, instance.image.name)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, update_fields=None,
+                                **kwargs):
+    if update_fields is not None and not {'name', 'text'} & set(update_fields):
+        return
+    update_search_vector(Recipe.objects.filter(pk=instance.pk))
@@ -0,0 +1,50 @@
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+from users.models import User
+
+from api.authentication import token_cache
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    """Синтетические данные из seed создаются один раз на сессию."""
+    with django_db_blocker.unblock():
+        call_command('seed', users=20, recipes=120, tags=4, ingredients=40,
+                     follows=5, favorites=8, carts=3, stdout=StringIO())
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(settings):
+    settings.ALLOWED_HOSTS = ['testserver', 'localhost']
+    cache.clear()
+    token_cache.clear()
+    yield
+    cache.clear()
+    token_cache.clear()
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.filter(follower__isnull=False).order_by('pk').first()
+
+
+@pytest.fixture
+def recipe(db):
+    return Recipe.objects.order_by('pk').first()
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
@@ -0,0 +1,58 @@
+import pytest
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test.utils import override_settings
+
+from api.executor import check_persistent_connections
+
+# Адреса асинхронных маршрутов; {recipe} подставляется из базы.
+URLS = (
+    '/api/recipes/?limit=5',
+    '/api/recipes/?limit=5&page=2',
+    '/api/recipes/?limit=5&page=99',
+    '/api/recipes/?pagination=cursor&limit=4',
+    '/api/recipes/?ordering=-favorites_count&limit=5',
+    '/api/recipes/{recipe}/',
+    '/api/recipes/999999/',
+    '/api/users/subscriptions/?limit=2&recipes_limit=2',
+    '/api/users/subscriptions/?recipes_limit=-1',
+    '/api/tags/',
+    '/api/ingredients/?name=а',
+)
+HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary')
+
+
+def fetch(client, url, urlconf):
+    with override_settings(ROOT_URLCONF=urlconf):
+        response = client.get(url)
+        result = [response.status_code, response.content]
+        result.extend(response.get(header) for header in HEADERS)
+        if response.get('ETag'):
+            conditional = client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+            result.extend((conditional.status_code, conditional.content))
+        result.append(client.head(url).status_code)
+    return result
+
+
+# Асинхронные вьюхи читают базу из потоков пула со своими соединениями,
+# им видны только данные, созданные до теста.
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', (False, True),
+                         ids=('anonymous', 'authenticated'))
+@pytest.mark.parametrize('url', URLS)
+def test_async_views_match_sync(client, user, recipe, url, authenticated):
+    if authenticated:
+        client.force_authenticate(user)
+    url = url.format(recipe=recipe.id)
+    assert fetch(client, url, 'tests.urls') == fetch(
+        client, url, 'foodgram.urls')
+
+
+def test_async_views_require_conn_max_age(monkeypatch):
+    database = settings.DATABASES['default']
+    monkeypatch.setitem(database, 'CONN_MAX_AGE', 0)
+    with pytest.raises(ImproperlyConfigured):
+        check_persistent_connections()
+    monkeypatch.setitem(database, 'CONN_MAX_AGE', 60)
+    check_persistent_connections()
@@ -0,0 +1,92 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+from api.authentication import TokenCache, token_cache
+from api.management.commands.seed import SEED_PASSWORD
+
+ME_URL = '/api/users/me/'
+
+
+@pytest.fixture
+def token(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    return token
+
+
+@pytest.fixture
+def token_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def reads_token(client, status=200):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(ME_URL)
+    assert response.status_code == status
+    return any('authtoken_token' in query['sql']
+               for query in queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_second_request_hits_cache(token_client):
+    assert reads_token(token_client)
+    hits = token_cache.stats()['hits']
+    assert not reads_token(token_client)
+    assert token_cache.stats()['hits'] == hits + 1
+
+
+@pytest.mark.django_db
+def test_expired_snapshot_is_reloaded(token_client, monkeypatch):
+    monkeypatch.setattr(token_cache, 'ttl', 0)
+    assert reads_token(token_client)
+    assert reads_token(token_client)
+
+
+@pytest.mark.django_db
+def test_logout_invalidates(token_client):
+    reads_token(token_client)
+    assert token_client.post('/api/auth/token/logout/').status_code == 204
+    assert reads_token(token_client, status=401)
+
+
+@pytest.mark.django_db
+def test_password_change_invalidates(token_client, user):
+    reads_token(token_client)
+    response = token_client.post('/api/users/set_password/', {
+        'current_password': SEED_PASSWORD,
+        'new_password': 'Другой-пароль-123',
+    }, format='json')
+    assert response.status_code == 200, response.content
+    assert reads_token(token_client)
+
+
+@pytest.mark.django_db
+def test_deactivation_invalidates(token_client, user):
+    reads_token(token_client)
+    user = User.objects.get(pk=user.pk)
+    user.is_active = False
+    user.save()
+    assert reads_token(token_client, status=401)
+
+
+@pytest.mark.django_db
+def test_invalidation_reaches_other_processes(token, user):
+    # Другой процесс: свои снимки в памяти, общий с этим кеш Django.
+    other = TokenCache(maxsize=10, ttl=60)
+    other.set(token.key, user.pk, 'snapshot', other.generation())
+    assert other.get(token.key) == 'snapshot'
+    token_cache.invalidate_user(user.pk)
+    assert other.get(token.key) is None
+
+
+@pytest.mark.django_db
+def test_snapshot_read_before_invalidation_is_not_stored(token, user):
+    generation = token_cache.generation()
+    token_cache.invalidate_user(user.pk)
+    token_cache.set(token.key, user.pk, 'snapshot', generation)
+    assert token_cache.get(token.key) is None
@@ -0,0 +1,58 @@
+import pytest
+from django.core.cache import cache
+
+from api.cache import bump_version, get_version
+from api.indexes import INGREDIENTS_SEARCH_LIMIT, IngredientIndex
+from recipes.models import Ingredient
+
+
+def test_version_is_not_reused_after_eviction():
+    old = bump_version('tags')
+    cache.delete('version:tags')
+    assert get_version('tags') > old
+    cache.delete('version:tags')
+    assert bump_version('tags') > old
+
+
+def test_bump_version_increments():
+    version = get_version('tags')
+    assert bump_version('tags') == version + 1
+    assert get_version('tags') == version + 1
+
+
+@pytest.mark.django_db
+def test_ingredient_index_prefix_before_substring():
+    Ingredient.objects.bulk_create([
+        Ingredient(name='морская тестсоль', unit_of_measurement='г'),
+        Ingredient(name='тестсоль', unit_of_measurement='г'),
+        Ingredient(name='Тестсоль крупная', unit_of_measurement='г'),
+    ])
+    names = [item['name'] for item in IngredientIndex().search('ТЕСТСОЛЬ')]
+    assert names == ['тестсоль', 'Тестсоль крупная', 'морская тестсоль']
+
+
+@pytest.mark.django_db
+def test_ingredient_index_limit():
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'тестмука {number:02}', unit_of_measurement='г')
+        for number in range(INGREDIENTS_SEARCH_LIMIT + 10)
+    )
+    found = IngredientIndex().search('тестмука')
+    assert len(found) == INGREDIENTS_SEARCH_LIMIT
+    assert found[-1]['name'] == (
+        f'тестмука {INGREDIENTS_SEARCH_LIMIT - 1:02}')
+
+
+@pytest.mark.django_db
+def test_ingredient_index_rebuilds_on_version_bump():
+    index = IngredientIndex()
+    assert index.search('тестперец') == []
+    # bulk_create не шлёт сигналов: индекс живёт на старой версии.
+    Ingredient.objects.bulk_create(
+        [Ingredient(name='тестперец', unit_of_measurement='г')])
+    assert index.search('тестперец') == []
+    bump_version('ingredients')
+    assert [item['name'] for item in index.search('тестперец')] == [
+        'тестперец']
+    Ingredient.objects.create(name='тестперец чили', unit_of_measurement='г')
+    assert len(index.search('тестперец')) == 2
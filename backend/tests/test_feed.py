@@ -0,0 +1,80 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow, User
+
+from api import feed
+
+
+def new_recipe(author):
+    recipe = Recipe.objects.order_by('pk').first()
+    recipe.pk = None
+    recipe.author = author
+    recipe.save()
+    return recipe
+
+
+@pytest.mark.django_db
+def test_push_recipe_reaches_followers():
+    author = User.objects.filter(following__isnull=False).first()
+    followers = set(Follow.objects.filter(
+        author=author).values_list('user_id', flat=True))
+    recipe = new_recipe(author)
+    feed.push_recipe(recipe)
+    assert set(FeedEntry.objects.filter(recipe=recipe).values_list(
+        'user_id', flat=True)) == followers
+
+
+@pytest.mark.django_db
+def test_push_recipe_trims_feeds(monkeypatch):
+    monkeypatch.setattr(feed, 'FEED_MAX_ENTRIES', 1)
+    author = User.objects.filter(following__isnull=False).first()
+    followers = Follow.objects.filter(author=author).values('user_id')
+    assert FeedEntry.objects.filter(user_id__in=followers).exists()
+    recipe = new_recipe(author)
+    feed.push_recipe(recipe)
+    assert list(FeedEntry.objects.filter(user_id__in=followers).values_list(
+        'recipe_id', flat=True).distinct()) == [recipe.pk]
+    assert FeedEntry.objects.filter(
+        user_id__in=followers).count() == followers.count()
+
+
+@pytest.mark.django_db
+def test_backfill_is_one_query_for_all_authors(user, monkeypatch):
+    monkeypatch.setattr(feed, 'FEED_MAX_ENTRIES', 3)
+    authors = list(
+        User.objects.exclude(pk=user.pk).filter(recipes_count__gt=0)
+        .values_list('pk', flat=True)[:4]
+    )
+    FeedEntry.objects.filter(user=user).delete()
+    with CaptureQueriesContext(connection) as single:
+        feed.backfill(user, authors[:1])
+    FeedEntry.objects.filter(user=user).delete()
+    with CaptureQueriesContext(connection) as several:
+        feed.backfill(user, authors)
+    assert len(several) == len(single)
+    # Лента обрезана до FEED_MAX_ENTRIES самых новых рецептов авторов.
+    expected = list(
+        Recipe.objects.filter(author_id__in=authors)
+        .order_by('-pub_date', '-id').values_list('pk', flat=True)[:3]
+    )
+    assert list(
+        FeedEntry.objects.filter(user=user)
+        .order_by('-pub_date', '-id').values_list('recipe_id', flat=True)
+    ) == expected
+
+
+@pytest.mark.django_db
+def test_subscribe_fills_and_unsubscribe_clears_feed(user, user_client):
+    author = User.objects.exclude(pk=user.pk).exclude(
+        following__user=user).filter(recipes_count__gt=0).first()
+    url = f'/api/users/{author.id}/subscribe/'
+    author_entries = FeedEntry.objects.filter(user=user,
+                                              recipe__author=author)
+
+    assert user_client.post(url).status_code == 201
+    assert author_entries.count() == min(author.recipes.count(),
+                                         feed.FEED_MAX_ENTRIES)
+    assert user_client.delete(url).status_code == 204
+    assert not author_entries.exists()
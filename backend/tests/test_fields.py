@@ -0,0 +1,33 @@
+import pytest
+from rest_framework import serializers
+
+from api.fields import Base64ImageField
+
+PNG = ('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQ'
+       'DwAEhQGAhKmMIQAAAABJRU5ErkJggg==')
+
+
+@pytest.mark.parametrize('data', (
+    'data:image/png,abc',
+    'data:image/png;base64',
+    'data:image;base64,' + PNG,
+    'data:image/png;base64,abc!',
+))
+def test_invalid_data_uri(data):
+    with pytest.raises(serializers.ValidationError):
+        Base64ImageField().to_internal_value(data)
+
+
+def test_valid_data_uri():
+    image = Base64ImageField().to_internal_value(
+        'data:image/png;base64,' + PNG)
+    assert image.name.endswith('.png')
+
+
+@pytest.mark.parametrize('separator', ('\n', '\r\n', ' '))
+def test_line_wrapped_data_uri(separator):
+    wrapped = separator.join(PNG[start:start + 76]
+                             for start in range(0, len(PNG), 76))
+    image = Base64ImageField().to_internal_value(
+        'data:image/png;base64,' + wrapped + separator)
+    assert image.name.endswith('.png')
@@ -0,0 +1,83 @@
+import json
+from importlib import import_module
+from io import StringIO
+
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.operations import AddConstraint, RunPython
+
+from recipes.models import Ingredient, IngredientSum, Recipe
+
+merge_migration = import_module(
+    'recipes.migrations.0003_merge_duplicate_ingredients')
+constraint_migration = import_module(
+    'recipes.migrations.0004_ingredient_unique_ingredient_unit')
+
+
+def test_merge_and_constraint_are_separate_migrations():
+    assert all(
+        isinstance(operation, RunPython)
+        for operation in merge_migration.Migration.operations
+    )
+    assert all(
+        isinstance(operation, AddConstraint)
+        for operation in constraint_migration.Migration.operations
+    )
+
+
+@pytest.fixture
+def without_unique_ingredient():
+    constraint, = (
+        constraint for constraint in Ingredient._meta.constraints
+        if constraint.name == 'unique_ingredient_unit'
+    )
+    with connection.schema_editor() as editor:
+        editor.remove_constraint(Ingredient, constraint)
+    # Ограничение вернётся вместе с откатом транзакции теста.
+
+
+@pytest.mark.django_db
+def test_merge_duplicate_ingredients(without_unique_ingredient):
+    keep, first, second = (
+        Ingredient.objects.create(name='дубль', unit_of_measurement='г')
+        for _ in range(3)
+    )
+    several, with_keep, single = Recipe.objects.order_by('pk')[:3]
+    IngredientSum.objects.bulk_create([
+        IngredientSum(recipe=several, ingredient=first, sum=2),
+        IngredientSum(recipe=several, ingredient=second, sum=3),
+        IngredientSum(recipe=with_keep, ingredient=keep, sum=1),
+        IngredientSum(recipe=with_keep, ingredient=second, sum=4),
+        IngredientSum(recipe=single, ingredient=second, sum=7),
+    ])
+    several.ingredients.add(first, second)
+    with_keep.ingredients.add(keep, first)
+
+    merge_migration.merge_duplicate_ingredients(apps, None)
+
+    assert list(Ingredient.objects.filter(name='дубль')) == [keep]
+    assert dict(
+        IngredientSum.objects.filter(ingredient=keep)
+        .values_list('recipe_id', 'sum')
+    ) == {several.pk: 5, with_keep.pk: 5, single.pk: 7}
+    assert list(several.ingredients.filter(name='дубль')) == [keep]
+    assert list(with_keep.ingredients.filter(name='дубль')) == [keep]
+
+
+@pytest.mark.django_db
+def test_import_data_is_idempotent(tmp_path):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(json.dumps([
+        {'name': 'тестовая мука', 'measurement_unit': 'г'},
+        {'name': ' тестовая мука ', 'measurement_unit': 'г'},
+        {'name': 'тестовая мука', 'measurement_unit': 'кг'},
+    ]), encoding='utf-8')
+
+    call_command('import_data', path=str(path), stdout=StringIO())
+    count = Ingredient.objects.count()
+    call_command('import_data', path=str(path), stdout=StringIO())
+
+    assert Ingredient.objects.count() == count
+    assert Ingredient.objects.filter(name='тестовая мука').count() == 2
@@ -0,0 +1,92 @@
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.cache import bump_version, user_state_name
+from api.paginator import COUNT_ESTIMATE_THRESHOLD, get_count_key
+from api.views import RecipeViewSet
+from recipes.models import Recipe, Tag
+
+factory = APIRequestFactory()
+
+
+def count_key(url, user=None, action='list'):
+    request = Request(factory.get(url))
+    request.user = user
+    view = RecipeViewSet()
+    view.action = action
+    return get_count_key(request, view)
+
+
+@pytest.mark.django_db
+def test_count_key_ignores_pagination_and_param_order(user):
+    assert count_key('/?tags=a&tags=b&limit=6&page=2', user) == count_key(
+        '/?tags=b&tags=a&limit=50', user)
+    assert count_key('/?tags=a', user) != count_key('/?tags=b', user)
+
+
+@pytest.mark.django_db
+def test_count_key_follows_versions(user):
+    key = count_key('/?tags=a', user)
+    bump_version('recipes')
+    assert count_key('/?tags=a', user) != key
+
+
+@pytest.mark.django_db
+def test_count_key_is_user_scoped_for_user_filters(user):
+    key = count_key('/?is_favorited=1', user)
+    shared_key = count_key('/', user)
+    bump_version(user_state_name(user.pk))
+    assert count_key('/?is_favorited=1', user) != key
+    assert count_key('/', user) == shared_key
+    assert count_key('/feed/', user, action='feed') != count_key(
+        '/feed/', user)
+
+
+@pytest.mark.django_db
+def test_count_is_cached_and_invalidated(client, recipe):
+    url = '/api/recipes/?limit=6'
+    total = Recipe.objects.count()
+    response = client.get(url).json()
+    assert (response['count'], response['count_exact']) == (total, True)
+    assert count_key(url) is not None
+    assert cache.get(count_key(url)) == (total, True)
+
+    # Пока версии не менялись, отдаётся закешированное число.
+    cache.set(count_key(url), (total + 5, True))
+    assert client.get(url).json()['count'] == total + 5
+
+    recipe.delete()
+    assert client.get(url).json()['count'] == total - 1
+
+    recipe.pk = None
+    recipe.save()
+    assert client.get(url).json()['count'] == total
+
+
+@pytest.mark.django_db
+def test_cursor_mode_has_no_count(client):
+    response = client.get('/api/recipes/?pagination=cursor&limit=2').json()
+    assert 'count' not in response
+    assert len(response['results']) == 2
+    ids = [item['id'] for item in response['results']]
+    response = client.get(response['next']).json()
+    assert 'count' not in response
+    assert not set(ids) & {item['id'] for item in response['results']}
+
+
+@pytest.mark.django_db
+def test_estimate_for_unfiltered_list(client):
+    estimate = COUNT_ESTIMATE_THRESHOLD + 1
+    with mock.patch('api.paginator.estimate_count', return_value=estimate):
+        response = client.get('/api/recipes/?limit=6').json()
+        assert (response['count'], response['count_exact']) == (
+            estimate, False)
+        tag = Tag.objects.filter(recipes__isnull=False).first()
+        response = client.get(
+            f'/api/recipes/?limit=6&tags={tag.slug}').json()
+    assert response['count_exact'] is True
+    assert response['count'] == Recipe.objects.filter(tags=tag).count()
@@ -0,0 +1,34 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.profiling import get_profiles
+
+
+@pytest.mark.django_db
+def test_server_timing_when_profiling(settings):
+    settings.PROFILING = True
+    response = APIClient().get('/api/tags/')
+    assert response.status_code == 200
+    timing = response['Server-Timing']
+    for name in ('sql', 'serialize', 'render', 'total'):
+        assert f'{name};dur=' in timing
+    assert get_profiles()[0]['path'] == '/api/tags/'
+
+
+@pytest.mark.django_db
+def test_no_server_timing_without_profiling(settings):
+    settings.PROFILING = False
+    response = APIClient().get('/api/tags/')
+    assert response.status_code == 200
+    assert 'Server-Timing' not in response
+
+
+@pytest.mark.django_db
+def test_profiles_are_staff_only(client, user_client, user):
+    assert client.get('/api/profiles/').status_code == 401
+    assert user_client.get('/api/profiles/').status_code == 403
+    user.is_staff = True
+    user_client.force_authenticate(user)
+    response = user_client.get('/api/profiles/')
+    assert response.status_code == 200
+    assert set(response.json()) == {'enabled', 'token_cache', 'results'}
@@ -0,0 +1,57 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# (адрес, нужна ли авторизация, бюджет с пустым кешем, с прогретым).
+# Адреса с разным limit проверяются с одним бюджетом: число запросов
+# не должно зависеть от размера страницы. В бюджет рецептов входит
+# запрос валидаторов ETag. С пустым кешем добавляются COUNT(*),
+# рендер общей части рецептов и чтение версий; с прогретым флаги
+# пользователя в рецептах — один запрос.
+QUERY_BUDGETS = (
+    ('/api/recipes/?limit=6', False, 6, 2),
+    ('/api/recipes/?limit=50', False, 6, 2),
+    ('/api/recipes/{recipe}/', False, 4, 2),
+    ('/api/recipes/?tags=seed-0&tags=seed-1&limit=6', False, 6, 2),
+    ('/api/recipes/?ingredients={ingredients}&limit=6', False, 6, 2),
+    ('/api/recipes/?ingredients={ingredients}&match=any&limit=6',
+     False, 6, 2),
+    ('/api/recipes/?exclude={ingredients}&limit=6', False, 6, 2),
+    ('/api/users/?limit=6', False, 3, 2),
+    ('/api/users/?limit=50', False, 3, 2),
+    ('/api/tags/', False, 1, 1),
+    ('/api/ingredients/?name=а', False, 1, 1),
+    ('/api/recipes/{recipe}/', True, 5, 3),
+    ('/api/recipes/?limit=6', True, 7, 3),
+    ('/api/recipes/?limit=50', True, 7, 3),
+    ('/api/recipes/?pagination=cursor&limit=6', True, 7, 3),
+    ('/api/recipes/?pagination=cursor&limit=50', True, 7, 3),
+    ('/api/users/?limit=6', True, 4, 3),
+    ('/api/users/?limit=50', True, 4, 3),
+    ('/api/users/subscriptions/?limit=6&recipes_limit=3', True, 7, 4),
+    ('/api/users/subscriptions/?limit=50', True, 7, 4),
+    ('/api/recipes/feed/?limit=6', True, 6, 3),
+    ('/api/recipes/feed/?pagination=cursor&limit=50', True, 6, 3),
+)
+
+
+def get_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200, response.content
+    return len(queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'url, authenticated, cold_budget, warm_budget', QUERY_BUDGETS)
+def test_query_budget(client, user_client, recipe, url, authenticated,
+                      cold_budget, warm_budget):
+    client = user_client if authenticated else client
+    url = url.format(recipe=recipe.id, ingredients=','.join(
+        str(pk) for pk in recipe.recipe_ingredients.values_list(
+            'ingredient_id', flat=True)[:2]))
+    cache.clear()
+    assert get_queries(client, url) <= cold_budget
+    assert get_queries(client, url) <= warm_budget
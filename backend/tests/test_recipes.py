@@ -0,0 +1,190 @@
+import pytest
+from django.db import connection
+from django.db.models import Count, F
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.cache import bump_version
+from api.serializers import RecipeCreateSerializer
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+
+@pytest.mark.django_db
+def test_list_has_no_last_modified(client):
+    response = client.get('/api/recipes/?limit=6')
+    assert response.status_code == 200
+    assert 'ETag' in response
+    assert 'Last-Modified' not in response
+
+
+@pytest.mark.django_db
+def test_list_etag_changes_after_delete(client):
+    url = '/api/recipes/?limit=6'
+    etag = client.get(url)['ETag']
+    Recipe.objects.order_by('pk').first().delete()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_list_etag_changes_after_recipes_version(client):
+    url = '/api/recipes/?limit=6'
+    etag = client.get(url)['ETag']
+    bump_version('recipes')
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_detail_has_last_modified(client, recipe):
+    response = client.get(f'/api/recipes/{recipe.id}/')
+    assert response.status_code == 200
+    assert 'Last-Modified' in response
+
+
+@pytest.mark.django_db
+def test_update_ingredients_changes_detail(client):
+    recipe = Recipe.objects.order_by('pk').first()
+    author = recipe.author
+    url = f'/api/recipes/{recipe.id}/'
+    etag = client.get(url)['ETag']
+    updated_at = recipe.updated_at
+    ingredient = Ingredient.objects.exclude(
+        pk__in=recipe.ingredients.values('pk')).first()
+    client.force_authenticate(author)
+    response = client.patch(url, {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cook_time,
+        'tags': list(recipe.tags.values_list('pk', flat=True)),
+        'ingredients': [{'id': ingredient.pk, 'amount': 7}],
+    }, format='json')
+    assert response.status_code == 200, response.content
+    client.force_authenticate(None)
+    recipe.refresh_from_db()
+    assert recipe.updated_at > updated_at
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert [item['id'] for item in response.json()['ingredients']] == [
+        ingredient.pk]
+
+
+@pytest.mark.django_db
+def test_subscribe_changes_only_author_recipes(client, user_client, user):
+    author, other = User.objects.exclude(pk=user.pk).exclude(
+        following__user=user).filter(recipes_count__gt=0)[:2]
+    author_url = f'/api/recipes/{author.recipes.first().id}/'
+    other_url = f'/api/recipes/{other.recipes.first().id}/'
+    author_etag = client.get(author_url)['ETag']
+    other_etag = client.get(other_url)['ETag']
+
+    response = user_client.post(f'/api/users/{author.id}/subscribe/')
+    assert response.status_code == 201
+
+    response = client.get(author_url, HTTP_IF_NONE_MATCH=author_etag)
+    assert response.status_code == 200
+    assert response.json()['author']['followers_count'] == (
+        author.followers_count + 1)
+    response = client.get(other_url, HTTP_IF_NONE_MATCH=other_etag)
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_update_keeps_concurrent_counters(recipe):
+    request = Request(APIRequestFactory().patch('/'))
+    request.user = recipe.author
+    stale = Recipe.objects.get(pk=recipe.pk)
+    Recipe.objects.filter(pk=recipe.pk).update(
+        favorites_count=F('favorites_count') + 3,
+        carts_count=F('carts_count') + 2,
+    )
+    serializer = RecipeCreateSerializer(
+        stale, data={'name': 'Новое название'}, partial=True,
+        context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+
+    recipe.refresh_from_db()
+    assert recipe.name == 'Новое название'
+    assert recipe.favorites_count == stale.favorites_count + 3
+    assert recipe.carts_count == stale.carts_count + 2
+
+
+def result_ids(client, query):
+    response = client.get(f'/api/recipes/?limit=200&{query}')
+    assert response.status_code == 200, response.content
+    data = response.json()
+    ids = [item['id'] for item in data['results']]
+    assert data['count'] == len(ids)
+    return ids
+
+
+@pytest.mark.django_db
+def test_filter_ingredients_match_all_and_any(client, recipe):
+    first, second = recipe.recipe_ingredients.values_list(
+        'ingredient_id', flat=True)[:2]
+    query = f'ingredients={first},{second}'
+    with_first = set(Recipe.objects.filter(
+        recipe_ingredients__ingredient_id=first).values_list('pk', flat=True))
+    with_second = set(Recipe.objects.filter(
+        recipe_ingredients__ingredient_id=second).values_list('pk', flat=True))
+
+    all_ids = result_ids(client, query)
+    assert recipe.pk in all_ids
+    assert sorted(all_ids) == sorted(with_first & with_second)
+    any_ids = result_ids(client, f'{query}&match=any')
+    assert sorted(any_ids) == sorted(with_first | with_second)
+    # Рецепты с обоими ингредиентами идут первыми.
+    assert set(any_ids[:len(all_ids)]) == set(all_ids)
+
+
+@pytest.mark.django_db
+def test_filter_exclude_ingredients(client, recipe):
+    ingredient_id = recipe.recipe_ingredients.values_list(
+        'ingredient_id', flat=True)[0]
+    ids = result_ids(client, f'exclude={ingredient_id}')
+    assert recipe.pk not in ids
+    assert sorted(ids) == sorted(Recipe.objects.exclude(
+        recipe_ingredients__ingredient_id=ingredient_id).values_list(
+        'pk', flat=True))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query', (
+    'ingredients=a', 'exclude=1,x', 'ingredients=1&match=some'))
+def test_filter_ingredients_rejects_bad_values(client, query):
+    assert client.get(f'/api/recipes/?{query}').status_code == 400
+
+
+@pytest.mark.django_db
+def test_filter_tags_has_no_duplicates(client):
+    recipe = Recipe.objects.annotate(
+        tags_total=Count('tags')).filter(tags_total__gt=1).first()
+    slugs = list(recipe.tags.values_list('slug', flat=True))
+    ids = result_ids(client, '&'.join(f'tags={slug}' for slug in slugs))
+    assert len(ids) == len(set(ids))
+    assert recipe.pk in ids
+    assert sorted(ids) == sorted(Recipe.objects.filter(
+        tags__slug__in=slugs).distinct().values_list('pk', flat=True))
+
+
+@pytest.mark.django_db
+def test_favorite_keeps_shared_render(client, user_client, user):
+    recipe = Recipe.objects.exclude(is_liked__user=user).order_by('pk').first()
+    url = f'/api/recipes/{recipe.id}/'
+    etag = client.get(url)['ETag']
+    assert user_client.post(f'{url}favorite/').status_code == 201
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['favorites_count'] == recipe.favorites_count + 1
+    # Общая часть рецепта взята из кеша: теги и ингредиенты не читались.
+    assert not any('recipes_ingredientsum' in query['sql']
+                   for query in queries.captured_queries)
+    recipe.refresh_from_db()
+    assert recipe.updated_at < recipe.counters_updated_at
@@ -0,0 +1,98 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import BuyList, Liked, Recipe
+
+MISSING_ID = 10 ** 6
+BULK_RELATIONS = (
+    ('/api/recipes/favorite/', Liked, 'favorites_count'),
+    ('/api/recipes/shopping_cart/', BuyList, 'carts_count'),
+)
+
+
+def data_queries(context):
+    return [query['sql'] for query in context.captured_queries
+            if 'SAVEPOINT' not in query['sql']]
+
+
+@pytest.mark.django_db
+def test_favorite_delete_decrements_once(user_client, user):
+    recipe = Recipe.objects.exclude(is_liked__user=user).order_by('pk').first()
+    url = f'/api/recipes/{recipe.id}/favorite/'
+    assert user_client.post(url).status_code == 201
+    recipe.refresh_from_db()
+    favorites_count = recipe.favorites_count
+
+    assert user_client.delete(url).status_code == 204
+    assert user_client.delete(url).status_code == 404
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == favorites_count - 1
+    assert not Liked.objects.filter(user=user, recipe=recipe).exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('action', ('favorite', 'shopping_cart'))
+def test_relate_delete_nothing_is_not_found(user_client, user, action):
+    recipe = Recipe.objects.exclude(is_liked__user=user).exclude(
+        to_buy__user=user).order_by('pk').first()
+    counters = (recipe.favorites_count, recipe.carts_count)
+    response = user_client.delete(f'/api/recipes/{recipe.id}/{action}/')
+    assert response.status_code == 404
+    recipe.refresh_from_db()
+    assert (recipe.favorites_count, recipe.carts_count) == counters
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url, model, counter', BULK_RELATIONS)
+def test_bulk_add_and_remove(user_client, user, url, model, counter):
+    existing = Recipe.objects.order_by('pk')[0]
+    model.objects.get_or_create(user=user, recipe=existing)
+    new = list(
+        Recipe.objects.exclude(pk__in=model.objects.filter(
+            user=user).values('recipe_id'))
+        .order_by('pk').values_list('pk', flat=True)[:2]
+    )
+    ids = [*new, existing.pk, MISSING_ID]
+
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.post(url, {'ids': ids}, format='json')
+    assert response.status_code == 201
+    assert response.json()['results'] == [
+        {'id': new[0], 'status': 'added'},
+        {'id': new[1], 'status': 'added'},
+        {'id': existing.pk, 'status': 'exists'},
+        {'id': MISSING_ID, 'status': 'not_found'},
+    ]
+    # SELECT с признаком связи и INSERT, плюс пересчёт счётчика.
+    assert len(data_queries(context)) == 3
+    for recipe in Recipe.objects.filter(pk__in=new):
+        assert getattr(recipe, counter) == model.objects.filter(
+            recipe=recipe).count()
+
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.post(url, {'ids': ids}, format='json')
+    assert response.status_code == 200
+    assert len(data_queries(context)) == 1
+
+    response = user_client.delete(
+        url, {'ids': [new[0], MISSING_ID]}, format='json')
+    assert response.status_code == 200
+    assert response.json()['results'] == [
+        {'id': new[0], 'status': 'removed'},
+        {'id': MISSING_ID, 'status': 'missing'},
+    ]
+    assert not model.objects.filter(user=user, recipe_id=new[0]).exists()
+    recipe = Recipe.objects.get(pk=new[0])
+    assert getattr(recipe, counter) == model.objects.filter(
+        recipe=recipe).count()
+
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.delete(url, {'ids': [new[0]]}, format='json')
+    assert response.json()['results'] == [{'id': new[0], 'status': 'missing'}]
+    assert len(data_queries(context)) == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', [url for url, _, _ in BULK_RELATIONS])
+def test_bulk_rejects_empty_ids(user_client, url):
+    assert user_client.post(url, {'ids': []}, format='json').status_code == 400
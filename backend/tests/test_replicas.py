@@ -0,0 +1,106 @@
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+from api.cache import bump_version
+
+REPLICA: str = 'replica_0'
+SECOND_REPLICA: str = 'replica_1'
+
+
+@pytest.fixture(scope='module')
+def replica_alias(django_db_setup):
+    """Реплика — зеркало тестовой базы со своим соединением.
+
+    Тест выполняется в транзакции основного соединения, поэтому его
+    записи реплике не видны, как реплике, которая ещё не догнала
+    основную базу.
+    """
+    for alias in (REPLICA, SECOND_REPLICA):
+        connections.settings[alias] = {
+            **connections['default'].settings_dict,
+            'TEST': {'MIRROR': 'default'},
+        }
+    yield REPLICA
+    for alias in (REPLICA, SECOND_REPLICA):
+        connections[alias].close()
+        del connections.settings[alias]
+
+
+@pytest.fixture
+def replicas(replica_alias, settings):
+    settings.REPLICA_DATABASES = [replica_alias]
+
+
+def token_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.mark.django_db(databases=['default', REPLICA])
+def test_anonymous_reads_go_to_replica(replicas, client):
+    with CaptureQueriesContext(connections[REPLICA]) as replica_queries:
+        response = client.get('/api/recipes/?limit=6')
+    assert response.status_code == 200
+    assert len(replica_queries)
+
+
+@pytest.mark.django_db(databases=['default', REPLICA])
+def test_only_writer_is_pinned(replicas, user):
+    recipe = Recipe.objects.exclude(is_liked__user=user).order_by('pk')[0]
+    url = f'/api/recipes/{recipe.id}/'
+    writer = token_client(user)
+    other = token_client(
+        User.objects.exclude(pk=user.pk).order_by('pk').first())
+
+    assert writer.post(f'{url}favorite/').status_code == 201
+
+    response = writer.get(url)
+    assert response.json()['is_favorited'] is True
+    assert response.json()['favorites_count'] == recipe.favorites_count + 1
+    # Другой клиент читает реплику, которая записи ещё не видела.
+    with CaptureQueriesContext(connections[REPLICA]) as replica_queries:
+        response = other.get(url)
+    assert len(replica_queries)
+    assert response.json()['favorites_count'] == recipe.favorites_count
+
+
+@pytest.mark.django_db(databases=['default', REPLICA])
+def test_version_bump_does_not_pin(replicas, client):
+    bump_version('recipes')
+    with CaptureQueriesContext(connections[REPLICA]) as replica_queries:
+        client.get('/api/recipes/?limit=6')
+    assert len(replica_queries)
+
+
+@pytest.mark.django_db(databases=['default', REPLICA])
+def test_shared_cache_is_built_from_primary(replicas, client):
+    tag = Tag.objects.filter(recipes__isnull=False).order_by('pk').first()
+    recipe = tag.recipes.order_by('pk').first()
+    tag.name = 'Новое имя тега'
+    tag.save()
+
+    response = client.get('/api/tags/')
+    assert tag.name in [item['name'] for item in response.json()]
+    response = client.get(f'/api/recipes/{recipe.id}/')
+    assert tag.name in [item['name'] for item in response.json()['tags']]
+
+
+@pytest.mark.django_db(databases=['default', REPLICA, SECOND_REPLICA])
+def test_replica_is_chosen_once_per_request(replica_alias, settings, client):
+    settings.REPLICA_DATABASES = [REPLICA, SECOND_REPLICA]
+    for _ in range(10):
+        bump_version('recipes')
+        with CaptureQueriesContext(connections[REPLICA]) as first, \
+                CaptureQueriesContext(
+                    connections[SECOND_REPLICA]) as second:
+            response = client.get('/api/recipes/?limit=6')
+        assert response.status_code == 200
+        assert sorted((len(first), len(second)))[0] == 0
+        assert len(first) + len(second) > 1
@@ -0,0 +1,98 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Prefetch
+from recipes.models import Recipe
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.models import User
+
+from api.planner import get_query_plan
+from api.representations import load_recipe_relations, recipe_data
+from api.resolvers import get_favorites, get_shopping_cart, get_subscriptions
+from api.serializers import FollowSerializer, RecipeSerializer
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+def load_recipes():
+    return list(get_query_plan(RecipeSerializer).apply(
+        Recipe.objects.order_by('pk'), prefetch=False))
+
+
+@pytest.fixture(params=(False, True), ids=('anonymous', 'authenticated'))
+def request_user(request, user):
+    return user if request.param else AnonymousUser()
+
+
+@pytest.fixture
+def api_request(request_user):
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = request_user
+    return request
+
+
+@pytest.fixture
+def image_recipe(db):
+    recipe = Recipe.objects.order_by('pk').first()
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image='recipes/images/test.png',
+        image_thumbnail='recipes/images/test_thumbnail.webp',
+        image_webp='recipes/images/test.webp',
+    )
+    return recipe
+
+
+@pytest.mark.django_db
+def test_recipe_data_matches_drf(api_request, request_user, image_recipe):
+    recipes = load_recipes()
+    get_query_plan(RecipeSerializer).prefetch(recipes)
+    serializer = RecipeSerializer(context={'request': api_request})
+    serializer.prime(recipes)
+    expected = [serializer.render(recipe) for recipe in recipes]
+
+    recipes = load_recipes()
+    context = {'request': api_request}
+    RecipeSerializer(context=context).prime(recipes)
+    tags, ingredients = load_recipe_relations(
+        [recipe.pk for recipe in recipes])
+    actual = [
+        recipe_data(
+            recipe, tags[recipe.pk], ingredients[recipe.pk], api_request,
+            favorited=recipe.id in get_favorites(context),
+            in_cart=recipe.id in get_shopping_cart(context),
+            subscribed=recipe.author_id in get_subscriptions(context),
+        )
+        for recipe in recipes
+    ]
+    cached = RecipeSerializer(
+        load_recipes(), many=True, context={'request': api_request}).data
+
+    assert [render(data) for data in actual] == [
+        render(data) for data in expected]
+    assert [render(data) for data in cached] == [
+        render(data) for data in expected]
+    assert expected[0]['image'].endswith('/media/recipes/images/test.png')
+    if request_user.is_authenticated:
+        assert any(data['is_favorited'] for data in expected)
+        assert any(data['is_in_shopping_cart'] for data in expected)
+        assert any(data['author']['is_subscribed'] for data in expected)
+
+
+@pytest.mark.django_db
+def test_follow_data_matches_drf(api_request, user):
+    authors = list(
+        get_query_plan(FollowSerializer).apply(
+            User.objects.filter(following__user=user), prefetch=False)
+        .prefetch_related(Prefetch(
+            'recipes', queryset=get_query_plan(RecipeSerializer).apply(
+                Recipe.objects.all(), prefetch=False)))
+    )
+    assert authors
+    serializer = FollowSerializer(context={'request': api_request})
+    serializer.prime(authors)
+    for author in authors:
+        assert render(serializer.to_representation(author)) == render(
+            serializer.render(author))
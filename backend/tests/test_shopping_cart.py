@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+from collections import defaultdict
+
+import pytest
+from recipes.models import IngredientSum
+
+from api.renderers import ShoppingListRenderer
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+@pytest.fixture
+def expected(user):
+    """Суммы по (название, единица), порядок строк задаёт база."""
+    totals = defaultdict(int)
+    rows = IngredientSum.objects.filter(
+        recipe__to_buy__user=user).values_list(
+            'ingredient__name', 'ingredient__unit_of_measurement', 'sum')
+    for name, unit, amount in rows:
+        totals[name, unit] += amount
+    assert totals
+    return sorted((name, unit, amount)
+                  for (name, unit), amount in totals.items())
+
+
+def download(client, **kwargs):
+    response = client.get(URL, **kwargs)
+    assert response.status_code == 200
+    assert response.streaming
+    return response, b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_text(user_client, expected):
+    response, content = download(user_client)
+    assert response['Content-Type'] == 'text/plain; charset=utf-8'
+    assert response['Content-Disposition'] == (
+        'attachment; filename=buy_list.txt')
+    lines = content.splitlines()
+    assert lines[:2] == ['Список покупок:', '']
+    assert sorted(lines[2:]) == sorted(
+        f'{name} - {amount} {unit}' for name, unit, amount in expected)
+
+
+@pytest.mark.django_db
+def test_csv(user_client, expected):
+    response, content = download(user_client, HTTP_ACCEPT='text/csv')
+    assert response['Content-Type'] == 'text/csv; charset=utf-8'
+    assert response['Content-Disposition'] == (
+        'attachment; filename=buy_list.csv')
+    rows = list(csv.reader(io.StringIO(content)))
+    assert rows[0] == ['name', 'measurement_unit', 'amount']
+    assert sorted(rows[1:]) == sorted([name, unit, str(amount)]
+                                      for name, unit, amount in expected)
+
+
+@pytest.mark.django_db
+def test_json(user_client, expected):
+    response = user_client.get(URL + '?format=json')
+    assert response['Content-Disposition'] == (
+        'attachment; filename=buy_list.json')
+    assert response.streaming
+    items = json.loads(b''.join(response.streaming_content))
+    assert sorted((item['name'], item['measurement_unit'], item['amount'])
+                  for item in items) == expected
+
+
+@pytest.mark.django_db
+def test_empty_cart_is_valid_json(client, user):
+    user.buy_list.all().delete()
+    client.force_authenticate(user)
+    response = client.get(URL + '?format=json')
+    assert b''.join(response.streaming_content) == b'[]'
+
+
+@pytest.mark.django_db
+def test_anonymous(client):
+    assert client.get(URL).status_code == 401
+
+
+def test_renderer_is_abstract():
+    with pytest.raises(TypeError):
+        ShoppingListRenderer()
@@ -0,0 +1,30 @@
+import pytest
+
+
+@pytest.mark.django_db
+def test_tags_json(client):
+    response = client.get('/api/tags/')
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/json'
+    assert response.json()
+    etag = response['ETag']
+    assert client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('kwargs', (
+    {'path': '/api/tags/?format=api'},
+    {'path': '/api/tags/', 'HTTP_ACCEPT': 'text/html'},
+))
+def test_tags_browsable_api(client, kwargs):
+    response = client.get(**kwargs)
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/html; charset=utf-8'
+
+
+@pytest.mark.django_db
+def test_tags_json_indent(client):
+    response = client.get(
+        '/api/tags/', HTTP_ACCEPT='application/json; indent=4')
+    assert response.status_code == 200
+    assert response.content.startswith(b'[\n    {')
@@ -0,0 +1,69 @@
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+from api.management.commands.seed import SEED_PASSWORD
+
+
+def token_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def author_client(user):
+    """Клиент автора, чей снимок уже лежит в кеше токенов."""
+    author = User.objects.exclude(pk=user.pk).exclude(
+        following__user=user).order_by('pk').first()
+    client = token_client(author)
+    assert client.get('/api/users/me/').status_code == 200
+    return author, client
+
+
+def follow(user_client, author):
+    response = user_client.post(f'/api/users/{author.id}/subscribe/')
+    assert response.status_code == 201
+    return User.objects.get(pk=author.pk)
+
+
+@pytest.mark.django_db
+def test_patch_me_keeps_followers_count(user_client, author_client):
+    author, client = author_client
+    followed = follow(user_client, author)
+
+    response = client.patch('/api/auth/users/me/',
+                            {'first_name': 'Новое'}, format='json')
+    assert response.status_code == 200, response.content
+    author.refresh_from_db()
+    assert author.first_name == 'Новое'
+    assert author.followers_count == followed.followers_count
+    assert author.counters_updated_at == followed.counters_updated_at
+
+
+@pytest.mark.django_db
+def test_set_password_keeps_followers_count(user_client, author_client):
+    author, client = author_client
+    followed = follow(user_client, author)
+
+    response = client.post('/api/auth/users/set_password/', {
+        'current_password': SEED_PASSWORD,
+        'new_password': 'Другой-пароль-123',
+    }, format='json')
+    assert response.status_code == 204, response.content
+    author.refresh_from_db()
+    assert author.check_password('Другой-пароль-123')
+    assert author.followers_count == followed.followers_count
+
+
+@pytest.mark.django_db
+def test_counters_are_saved_when_named(user):
+    user.followers_count += 5
+    user.save()
+    assert User.objects.get(pk=user.pk).followers_count != (
+        user.followers_count)
+    user.save(update_fields=['followers_count'])
+    assert User.objects.get(pk=user.pk).followers_count == (
+        user.followers_count)
@@ -0,0 +1,8 @@
+from django.urls import include, path
+
+from api import urls
+from api.async_views import async_urlpatterns
+
+urlpatterns = [
+    path('api/', include((async_urlpatterns(urls.urlpatterns), 'api'))),
+]
@@ -1,8 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 MAX_NAME_LENGTH: int = 150
 MAX_EMAIL_LENGTH: int = 254
+# Меняются только UPDATE с F() и пересчётом, полный save() их не пишет.
+COUNTER_FIELDS: tuple = ('followers_count', 'recipes_count',
+                         'counters_updated_at')
 
 
 class User(AbstractUser):
@@ -12,6 +16,27 @@ class User(AbstractUser):
         blank=False,
         null=False
     )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчики',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецепты',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+    # Сдвигается вместе со счётчиками: входит в ETag рецептов автора,
+    # но не в ключ кеша их общей части.
+    counters_updated_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name='Дата изменения счётчиков',
+    )
 
     class Meta:
         ordering = ('-id',)
@@ -20,6 +45,20 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def save(self, *args, update_fields=None, **kwargs):
+        """Сохраняет пользователя, не трогая счётчики.
+
+        Экземпляр мог быть прочитан задолго до сохранения (снимок из
+        кеша токенов, request.user в djoser), и его счётчики устарели.
+        Они записываются, только если явно названы в update_fields.
+        """
+        if update_fields is None and not self._state.adding:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(